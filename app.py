@@ -1,51 +1,62 @@
 import os
+import time
 from dotenv import load_dotenv
 from discord import Intents, Message, Embed
 from discord.ext import commands
 import discord
-from groq import Groq
+from utils.admission import AdmissionController, Rejected
+from utils.cache import ResponseCache
+from utils import metrics
+from utils.llm import CompletionService
+from utils.streaming import StreamingReply, split_text
+from utils.watchdog import LoopWatchdog
 import asyncio
 
 
+# STARTUP CLOCK, FOR THE TIME-TO-READY REPORT
+process_start = time.perf_counter()
 
 
-# LOAD OUR TOKEN FROM SOMEWHERE SAFE
-load_dotenv()
-dstoken = os.getenv("discord_token")
-groqtoken = os.getenv("groq_token")
+# METRICS, SERVED IN PROMETHEUS FORMAT WHEN metrics_port IS SET
+command_seconds = metrics.histogram('command_seconds', 'Time from command dispatch to completion.', labels=('command', 'status'))
+response_seconds = metrics.histogram('llm_response_seconds', 'Time to answer a gpt prompt.', labels=('mode',))
 
 
-# BOT SETUP
-intents = Intents.default()
-intents.message_content = True 
-client = commands.Bot(command_prefix="/", help_command=None, intents=intents)
+# BUILT BY create_bot(): IMPORTING THIS MODULE (E.G. AS A SPAWNED WORKER'S __mp_main__) MUST NOT START ANYTHING
+dstoken = None
+client = None
+admission = None
+llm = None
+llm_streaming = True
+metrics_server = None
+bot_close = None
 
 
-# GROQ SETUP
-groq_client = Groq(api_key=groqtoken)
+# RESPONSE FUNCTIONALITY
+async def get_response(user_input: str, key=None) -> str:
+    with response_seconds.time(mode='complete'):
+        return await llm.complete(user_input, key=key)
 
 
-# RESPONSE FUNCTIONALITY
-def get_response(user_input: str) -> str:
-    chat_completion = groq_client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": "Answer the prompt."
-            },
-            {
-                "role": "user",
-                "content": user_input
-            }
-        ],
-        model="llama3-8b-8192",
-        temperature=0.5,
-        max_tokens=1024,
-        top_p=1,
-        stop=None,
-        stream=False,
-    )
-    return chat_completion.choices[0].message.content
+# STREAMING FUNCTIONALITY
+async def stream_response(message: Message, user_input: str) -> None:
+    reply = StreamingReply(message.channel)
+    await reply.start()
+    started = time.perf_counter()
+    try:
+        async for delta in llm.stream(user_input, key=message.id):
+            reply.feed(delta)
+    except asyncio.TimeoutError:
+        reply.feed("\n*(The model took too long to answer, reply cut short.)*")
+    except asyncio.CancelledError:
+        reply.feed("\n*(Cancelled.)*")
+        raise
+    except Exception:
+        reply.feed("\n*(Couldn't get an answer from the model, try again later.)*")
+        raise
+    finally:
+        response_seconds.observe(time.perf_counter() - started, mode='stream')
+        await reply.finish()
 
 
 # MESSAGE FUNCTIONALITY
@@ -54,30 +65,97 @@ async def send_message(message: Message, user_message: str) -> None:
         print('(Message was empty because intents were not enabled probably)')
         return
 
+    queued_notice = None
+
+    async def on_queued(position: int) -> None:
+        nonlocal queued_notice
+        queued_notice = await message.reply(f"⏳ Queued, position {position}.", mention_author=False)
+
     try:
-        response: str = get_response(user_message)
-        await message.channel.send(response)
+        # Cached answers cost no model call, so they skip the admission queue
+        cached = await llm.cached(user_message)
+        if cached is not None:
+            for chunk in split_text(cached):
+                await message.channel.send(chunk)
+            return
+        guild_id = message.guild.id if message.guild else None
+        async with admission.slot(message.author.id, message.channel.id, guild_id, on_queued=on_queued):
+            if queued_notice is not None:
+                await queued_notice.delete()
+            if llm_streaming:
+                await stream_response(message, user_message)
+                return
+            response: str = await get_response(user_message, key=message.id)
+        for chunk in split_text(response or '(empty response)'):
+            await message.channel.send(chunk)
+    except Rejected as e:
+        await message.reply(f"Too many prompts right now ({e.reason}), try again in {e.retry_after:.0f}s.", mention_author=False)
+    except asyncio.TimeoutError:
+        await message.channel.send("The model took too long to answer, try again.")
+    except asyncio.CancelledError:
+        print(f'(Prompt {message.id} was cancelled)')
     except Exception as e:
         print(e)
 
 
 # HANDLING THE STARTUP FOR OUR BOT
-@client.event
+# on_ready fires again after every reconnect, so it must not do one-time work
+ready_reported = False
+
 async def on_ready() -> None:
+    global ready_reported
     await client.change_presence(status=discord.Status.online, activity=discord.Game('/help'))
+    if not ready_reported:
+        ready_reported = True
+        print(f'{client.user} is now running! (ready {time.perf_counter() - process_start:.2f}s after start)')
+
+
+# LOAD COGS ONCE, BEFORE CONNECTING TO THE GATEWAY
+async def setup_hook() -> None:
+    if client.watchdog is not None:
+        client.watchdog.start()
+    if metrics_server is not None:
+        await metrics_server.start()
     await load_cogs()
-    print(f'{client.user} is now running!')
+
+
+# RELEASE THE LLM CLIENT, METRICS SERVER AND WATCHDOG ON SHUTDOWN
+async def close() -> None:
+    if client.is_closed():
+        return
+    if client.watchdog is not None:
+        client.watchdog.stop()
+    try:
+        await bot_close()
+    finally:
+        await llm.close()
+        if metrics_server is not None:
+            await metrics_server.close()
 
 
 # LOAD COGS
+async def load_extension(name: str):
+    started = time.perf_counter()
+    try:
+        await client.load_extension(name)
+    except Exception as e:
+        print(f'Failed to load {name}: {e}')
+        return name, None
+    return name, time.perf_counter() - started
+
+
 async def load_cogs():
-    for filename in os.listdir('./cogs'):
-        if filename.endswith('.py') and filename != '__init__.py':
-            await client.load_extension(f'cogs.{filename[:-3]}')
+    started = time.perf_counter()
+    names = [f'cogs.{filename[:-3]}' for filename in sorted(os.listdir('./cogs'))
+             if filename.endswith('.py') and filename != '__init__.py']
+    results = await asyncio.gather(*(load_extension(name) for name in names))
+    print(f'Loaded {sum(elapsed is not None for _, elapsed in results)}/{len(names)} cogs '
+          f'in {(time.perf_counter() - started) * 1000:.0f} ms:')
+    for name, elapsed in sorted(results, key=lambda result: -(result[1] or 0)):
+        print(f'  {name}: ' + (f'{elapsed * 1000:.0f} ms' if elapsed is not None else 'FAILED'))
 
 
 # HANDLING INCOMING MESSAGES
-@client.event
 async def on_message(message: Message) -> None:
     if message.author == client.user:
         return
@@ -91,6 +169,25 @@ async def on_message(message: Message) -> None:
     await client.process_commands(message)
 
 
+# COMMAND TIMINGS
+async def start_command_timer(ctx) -> None:
+    ctx.started_at = time.perf_counter()
+    if client.watchdog is not None:
+        client.watchdog.track_command(ctx)
+
+
+async def stop_command_timer(ctx) -> None:
+    status = 'error' if ctx.command_failed else 'ok'
+    command_seconds.observe(time.perf_counter() - ctx.started_at, command=ctx.command.qualified_name, status=status)
+    if client.watchdog is not None:
+        client.watchdog.untrack_command()
+
+
+# CANCEL PENDING PROMPTS WHEN THEIR MESSAGE IS DELETED
+async def on_message_delete(message: Message) -> None:
+    llm.cancel(message.id)
+
+
 
 
 
@@ -98,7 +195,6 @@ async def on_message(message: Message) -> None:
 
 
 # ON COMMAND ERROR
-@client.event
 async def on_command_error(ctx, error):
     if isinstance(error, commands.CommandNotFound):
         embed = discord.Embed(
@@ -115,8 +211,58 @@ async def on_command_error(ctx, error):
             )
         await ctx.send(embed=embed)
 
+
+# BOT SETUP
+def create_bot() -> commands.Bot:
+    global dstoken, client, admission, llm, llm_streaming, metrics_server, bot_close
+
+    # LOAD OUR TOKEN FROM SOMEWHERE SAFE
+    load_dotenv()
+    dstoken = os.getenv("discord_token")
+    groqtoken = os.getenv("groq_token")
+
+    intents = Intents.default()
+    intents.message_content = True
+    client = commands.Bot(command_prefix="/", help_command=None, intents=intents)
+
+    # GROQ SETUP
+    admission = AdmissionController(
+        max_active=int(os.getenv("llm_max_concurrency", "4")),
+        max_queue=int(os.getenv("llm_max_queue", "20")),
+    )
+    llm = CompletionService(
+        api_key=groqtoken,
+        max_concurrency=int(os.getenv("llm_max_concurrency", "4")),
+        timeout=float(os.getenv("llm_timeout", "30")),
+        cache=ResponseCache(
+            ttl=float(os.getenv("llm_cache_ttl", "3600")),
+            path=os.getenv("llm_cache_path") or None,
+        ),
+        on_rate_limit=admission.throttle,
+    )
+    llm_streaming = os.getenv("llm_streaming", "1") == "1"
+
+    metrics_port = os.getenv("metrics_port")
+    metrics_server = metrics.MetricsServer(os.getenv("metrics_host", "127.0.0.1"), int(metrics_port)) if metrics_port else None
+    metrics.gauge('voice_connections', 'Connected voice clients.').collect_from('bot', lambda: {(): len(client.voice_clients)})
+
+    # EVENT LOOP WATCHDOG, ON WHEN loop_watchdog IS SET TO A STALL THRESHOLD IN SECONDS
+    loop_watchdog = os.getenv("loop_watchdog")
+    client.watchdog = LoopWatchdog(threshold=float(loop_watchdog)) if loop_watchdog else None
+
+    for handler in (on_ready, on_message, on_message_delete, on_command_error):
+        client.event(handler)
+    client.before_invoke(start_command_timer)
+    client.after_invoke(stop_command_timer)
+    client.setup_hook = setup_hook
+    bot_close = client.close
+    client.close = close
+    return client
+
+
 # MAIN ENTRY POINT
 def main() -> None:
+    create_bot()
     try:
         client.run(dstoken)
     except Exception as e:
@@ -124,4 +270,3 @@ def main() -> None:
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,70 @@
+"""Compare CPU cost of the PCM and Opus passthrough playback paths.
+
+Usage: python benchmarks/audio_paths.py <audio file or stream URL> [seconds]
+
+Each path reads `seconds` of audio (default 60) as fast as possible, doing
+the same work discord.py's player thread does per 20 ms frame: the PCM path
+encodes every frame to Opus in Python, the passthrough path only forwards
+packets. CPU time of both this process and the ffmpeg child is reported per
+minute of audio. The input should be Opus (e.g. a YouTube .webm) for the
+passthrough path to be a true copy.
+"""
+import resource
+import sys
+import time
+import discord
+from discord.opus import Encoder, _load_default
+
+FRAMES_PER_SECOND = 50
+
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run(name, source, frames, encode=None):
+    start_self = time.process_time()
+    start_children = children_cpu()
+    start_wall = time.perf_counter()
+    read = 0
+    while read < frames:
+        data = source.read()
+        if not data:
+            break
+        if encode is not None:
+            encode(data)
+        read += 1
+    source.cleanup()
+    wall = time.perf_counter() - start_wall
+    self_cpu = time.process_time() - start_self
+    ffmpeg_cpu = children_cpu() - start_children
+    minutes = read / FRAMES_PER_SECOND / 60
+    if not minutes:
+        print(f'{name}: no audio read')
+        return
+    print(f'{name:12} {read / FRAMES_PER_SECOND:7.1f}s audio  '
+          f'python {self_cpu / minutes:6.3f}  ffmpeg {ffmpeg_cpu / minutes:6.3f}  '
+          f'total {(self_cpu + ffmpeg_cpu) / minutes:6.3f} CPU s/stream-min  '
+          f'(wall {wall:.2f}s)')
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    source = sys.argv[1]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 60.0
+    frames = int(seconds * FRAMES_PER_SECOND)
+
+    if not _load_default():
+        sys.exit('libopus is required for the PCM path (discord.opus could not load it)')
+    encoder = Encoder()
+
+    run('pcm', discord.FFmpegPCMAudio(source, options='-vn'), frames,
+        encode=lambda data: encoder.encode(data, encoder.SAMPLES_PER_FRAME))
+    run('passthrough', discord.FFmpegOpusAudio(source, codec='copy', options='-vn'), frames)
+
+
+if __name__ == '__main__':
+    main()
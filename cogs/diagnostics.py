@@ -0,0 +1,34 @@
+import discord
+from discord.ext import commands
+
+
+class Diagnostics(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.is_owner()
+    @commands.command(name='blockers', help="Owner only: the calls that blocked the event loop the longest.")
+    async def blockers(self, ctx, count: int = 10):
+        watchdog = getattr(self.bot, 'watchdog', None)
+        if watchdog is None:
+            await ctx.send("The loop watchdog is off. Set `loop_watchdog` to a stall threshold in seconds to enable it.")
+            return
+
+        blockers = watchdog.top_blockers(min(max(count, 1), 25))  # Embeds hold at most 25 fields
+        if not blockers:
+            await ctx.send(f"No event loop stalls over {watchdog.threshold * 1000:.0f} ms so far.")
+            return
+
+        embed = discord.Embed(title="🐢 Top event loop blockers", color=discord.Color.orange())
+        for blocker in blockers:
+            embed.add_field(
+                name=blocker.where[:256],
+                value=f"`{blocker.call}` in {blocker.command or 'no command'}\n"
+                      f"{blocker.count} stalls, {blocker.total:.2f}s total, worst {blocker.worst * 1000:.0f} ms",
+                inline=False,
+            )
+        embed.set_footer(text=f"Threshold {watchdog.threshold * 1000:.0f} ms")
+        await ctx.send(embed=embed)
+
+async def setup(bot):
+    await bot.add_cog(Diagnostics(bot))
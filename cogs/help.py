@@ -18,11 +18,14 @@ class help(commands.Cog):
             ("/skip", "Skip to the next song in the queue"),
             ("/loop", "Play the current song in loop until /loop again"),
             ("/queue", "Display the current music queue"),
+            ("/remove <position>", "Remove a song from the queue"),
             ("/clear", "Clear the current music queue"),
-            ("/setalarm (hh:mm) (name)", "Set an alarm for you"),
+            ("/setalarm (hh:mm) [daily|weekdays|weekly] [Area/City] (name)", "Set an alarm for you"),
+            ("/alarms", "List your alarms"),
+            ("/cancelalarm <number>", "Cancel one of your alarms"),
             ("/dice", "Get a number from 1 to 6"),
             ("/rps", "Rock-Paper-Scissors Game Co-op"),
-            ("/xo", "Tic-Tac-Toe Game Co-op"),
+            ("/xo [bot] [size] [k]", "Tic-Tac-Toe Game Co-op or against the bot, on boards up to 5x5"),
         ]
         for name, desc in commands_list:
             embed.add_field(name=name, value=desc, inline=False)
@@ -2,9 +2,14 @@ import discord
 from discord import ButtonStyle, Embed, Interaction
 from discord.ext import commands
 from discord.ui import Button, View
-import yt_dlp
 import asyncio
+import time
 from random import shuffle
+from utils.audio import make_source
+from utils.audio_cache import AudioCache
+from utils.gapless import PrebufferedSource, TrackChain
+from utils.player import PlayerManager, PlayerState
+from utils.resolver import TrackResolver
 
 # Define FFmpeg options
 ffmpeg_opts = {
@@ -12,46 +17,141 @@ ffmpeg_opts = {
     'options': '-vn',
 }
 
-# Music queue
-music_queue = []
-
-# Music Control View class for interactive buttons
-class MusicControlView(View):
-    def __init__(self, ctx, cog):
-        super().__init__(timeout=None)
-        self.ctx = ctx
-        self.cog = cog
-
-    @discord.ui.button(emoji="⏯", style=ButtonStyle.grey, custom_id="pauseplay_button")
-    async def pause_button(self, interaction: Interaction, button: Button):
-        if interaction.guild.voice_client.is_playing():
-            interaction.guild.voice_client.pause()
-            await interaction.response.send_message(":pause_button: **Paused**", ephemeral=True)
-        elif interaction.guild.voice_client.is_paused():
-            interaction.guild.voice_client.resume()
-            await interaction.response.send_message(":play_pause: **Resumed**", ephemeral=True)
-        else:
-            await interaction.response.send_message("Not playing anything at the moment!", ephemeral=True)
-
-    @discord.ui.button(emoji="⏭", style=ButtonStyle.grey, custom_id="skip_button")
-    async def skip_button(self, interaction: Interaction, button: Button):
-        await interaction.response.send_message(":fast_forward: **Skipped**", ephemeral=True)
-        await self.cog.skip(self.ctx)
-
-    @discord.ui.button(emoji="<:dusto:746149609306456085>", style=ButtonStyle.secondary, custom_id="leave_button")
-    async def leave_button(self, interaction: Interaction, button: Button):
-        if interaction.guild.voice_client is not None:
-            if interaction.user.voice is None or interaction.user.voice.channel != interaction.guild.voice_client.channel:
-                await interaction.response.send_message("Not in the same channel!", ephemeral=True)
+# 'auto' passes Opus streams straight through to Discord, 'pcm' always decodes
+AUDIO_MODE = 'auto'
+
+# Local Opus cache for tracks played at least AUDIO_CACHE_THRESHOLD times
+AUDIO_CACHE_DIR = 'audio_cache'
+AUDIO_CACHE_MAX_BYTES = 2 * 1024 ** 3
+AUDIO_CACHE_THRESHOLD = 3
+
+# Gapless playback: the next song is started and buffered GAPLESS_LEAD seconds
+# before the current one ends; GAPLESS_CROSSFADE > 0 blends the two (forces PCM)
+GAPLESS = True
+GAPLESS_LEAD = 5.0
+GAPLESS_CROSSFADE = 0.0
+
+# Number of upcoming songs whose stream URL is resolved ahead of time
+PREFETCH_WINDOW = 1
+
+# Playlists are read this many entries at a time
+PLAYLIST_PAGE_SIZE = 50
+
+# URLs resolved concurrently by multi-track commands such as /jalel
+BATCH_RESOLVE_CONCURRENCY = 4
+
+# Seconds a player may sit idle with an empty queue before it is torn down
+IDLE_TIMEOUT = 300
+
+# Now Playing control buttons. Everything a button needs (action and guild) lives in
+# its custom_id and one registered DynamicItem class handles them all, so control
+# messages cost no memory and keep working across restarts.
+MUSIC_CONTROLS = (
+    ('pause', "⏯", ButtonStyle.grey),
+    ('skip', "⏭", ButtonStyle.grey),
+    ('leave', "<:dusto:746149609306456085>", ButtonStyle.secondary),
+)
+CONTROL_EMOJI = {action: (emoji, style) for action, emoji, style in MUSIC_CONTROLS}
+
+class MusicControl(discord.ui.DynamicItem[Button], template=r'music:(?P<action>pause|skip|leave):(?P<guild_id>[0-9]+)'):
+    def __init__(self, action: str, guild_id: int):
+        emoji, style = CONTROL_EMOJI[action]
+        super().__init__(Button(emoji=emoji, style=style, custom_id=f'music:{action}:{guild_id}'))
+        self.action = action
+        self.guild_id = guild_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: Interaction, item: Button, match):
+        return cls(match['action'], int(match['guild_id']))
+
+    async def callback(self, interaction: Interaction):
+        cog = interaction.client.get_cog('MusicCog')
+        guild = interaction.client.get_guild(self.guild_id)
+        voice_client = guild.voice_client if guild is not None else None
+        if cog is None or voice_client is None:
+            await interaction.response.send_message("Not in a voice channel!", ephemeral=True)
+        elif self.action == 'pause':
+            player = cog.players.get(self.guild_id)
+            if voice_client.is_playing():
+                voice_client.pause()
+                player.set_state(PlayerState.PAUSED)
+                await interaction.response.send_message(":pause_button: **Paused**", ephemeral=True)
+            elif voice_client.is_paused():
+                voice_client.resume()
+                player.set_state(PlayerState.PLAYING)
+                await interaction.response.send_message(":play_pause: **Resumed**", ephemeral=True)
             else:
-                await interaction.guild.voice_client.disconnect()
-                await interaction.response.send_message("⛔️ **Disconnected**", ephemeral=True)
+                await interaction.response.send_message("Not playing anything at the moment!", ephemeral=True)
+        elif self.action == 'skip':
+            if cog.skip_current(guild):
+                await interaction.response.send_message(":fast_forward: **Skipped**", ephemeral=True)
+            else:
+                await interaction.response.send_message("Not playing anything at the moment!", ephemeral=True)
+        elif interaction.user.voice is None or interaction.user.voice.channel != voice_client.channel:
+            await interaction.response.send_message("Not in the same channel!", ephemeral=True)
         else:
-            await interaction.response.send_message("Not in a voice channel!", ephemeral=True)
+            await voice_client.disconnect()
+            await interaction.response.send_message("⛔️ **Disconnected**", ephemeral=True)
+
+def music_controls(guild_id: int) -> View:
+    view = View(timeout=None)
+    for action, _, _ in MUSIC_CONTROLS:
+        view.add_item(MusicControl(action, guild_id))
+    return view
+
+def format_duration(seconds):
+    if not seconds:
+        return "N/A"
+    seconds = int(seconds)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def make_track(info, url=None):
+    """Queue descriptor from a full or flat (playlist/search) yt-dlp entry."""
+    thumbnail = info.get('thumbnail')
+    if not thumbnail and info.get('thumbnails'):
+        thumbnail = info['thumbnails'][-1].get('url')
+    return {
+        'id': info['id'],
+        'title': info.get('title') or info['id'],
+        'duration': format_duration(info.get('duration')),
+        'seconds': info.get('duration'),
+        'webpage_url': info.get('webpage_url') or url or info['url'],
+        'thumbnail': thumbnail or '',
+    }
 
 class MusicCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.resolver = TrackResolver()
+        self.audio_cache = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, AUDIO_CACHE_THRESHOLD)
+        self.players = PlayerManager(idle_timeout=IDLE_TIMEOUT, on_teardown=self.teardown)
+        self.prefetching = set()
+        self.ingesting = {}
+
+    async def cog_load(self):
+        self.bot.add_dynamic_items(MusicControl)
+        self.players.start()
+
+    async def cog_unload(self):
+        self.bot.remove_dynamic_items(MusicControl)
+        for task in self.prefetching:
+            task.cancel()
+        for guild_id in list(self.ingesting):
+            self.stop_ingesting(guild_id)
+        self.players.close()
+        self.audio_cache.close()
+        self.resolver.shutdown()
+
+    async def teardown(self, guild_id):
+        """Leave voice in a guild whose player went idle."""
+        self.stop_ingesting(guild_id)
+        guild = self.bot.get_guild(guild_id)
+        if guild is not None and guild.voice_client is not None:
+            await guild.voice_client.disconnect()
+
+    async def cog_command_error(self, ctx, error):
+        if isinstance(getattr(error, 'original', error), asyncio.TimeoutError):
+            await ctx.send("YouTube took too long to answer, try again.")
 
     @commands.command(name='join')
     async def join(self, ctx):
@@ -77,16 +177,18 @@ class MusicCog(commands.Cog):
     @commands.command(name='pause')
     async def pause(self, ctx):
         voice_client = ctx.message.guild.voice_client
-        if voice_client.is_playing():
+        if voice_client is not None and voice_client.is_playing():
             voice_client.pause()
+            self.players.get(ctx.guild.id).set_state(PlayerState.PAUSED)
         else:
             await ctx.send("The bot is not playing anything at the moment.")
 
     @commands.command(name='resume')
     async def resume(self, ctx):
         voice_client = ctx.message.guild.voice_client
-        if voice_client.is_paused():
+        if voice_client is not None and voice_client.is_paused():
             voice_client.resume()
+            self.players.get(ctx.guild.id).set_state(PlayerState.PLAYING)
         else:
             await ctx.send("Not playing anything before this. Use /play command!")
 
@@ -104,28 +206,23 @@ class MusicCog(commands.Cog):
         if 'list=' in url:
             await self.play_playlist(ctx, url)
         else:
-            if 'https://www.youtube.com/watch?' not in url:
-                ydl_opts = {
-                    'format': 'bestaudio/best',
-                    'quiet': True,
-                    'default_search': 'ytsearch1',
-                }
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    if info['entries']:
-                        url = info['entries'][0]['webpage_url']
-
-                
-            self.add_to_queue(url)
-            if not ctx.voice_client.is_playing():
+            if not url.startswith(('http://', 'https://')):
+                results = await self.resolver.search(url, 1)
+                if not results:
+                    await ctx.send(f"No results found for '{url}'.")
+                    return
+                url = results[0].get('webpage_url') or results[0]['url']
+
+            player = self.players.get(ctx.guild.id)
+            info = await self.add_to_queue(player, url)
+            if player.state is PlayerState.IDLE:
                 await self.play_next(ctx)
             else:
-                info = music_queue[-1]
                 embed = discord.Embed(
                     title="🎵 Added to Queue",
-                    description=f"**Title:** [{info['title']}]({info['url']})\n"
+                    description=f"**Title:** [{info['title']}]({info['webpage_url']})\n"
                                 f"**Duration:** `{info['duration']}`\n"
-                                f"**Position in Queue:** `{len(music_queue)}`",
+                                f"**Position in Queue:** `{len(player)}`",
                     color=discord.Color.green()
                 )
                 embed.set_footer(text="Use !queue to view the full queue")
@@ -133,66 +230,205 @@ class MusicCog(commands.Cog):
                 await ctx.send(embed=embed)
 
     async def play_playlist(self, ctx, playlist_url: str):
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'quiet': True,
-            'extract_flat': True,
-            'playlist_items': '1-5'  # Limit to first 5 items for simplicity
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(playlist_url, download=False)
-            for entry in info['entries']:
-                self.add_to_queue(entry['url'])
-
-        if not ctx.voice_client.is_playing():
+        player = self.players.get(ctx.guild.id)
+        pages = self.resolver.iter_playlist(playlist_url, PLAYLIST_PAGE_SIZE)
+        info = await anext(pages, None)
+        if info is None:
+            await ctx.send("That playlist is empty or unavailable.")
+            return
+        tracks = [make_track(entry) for entry in info['entries']]
+        for track in tracks:
+            player.enqueue(track)
+        task = asyncio.create_task(self.ingest_playlist(ctx, player, pages, tracks))
+        self.ingesting.setdefault(ctx.guild.id, set()).add(task)
+        task.add_done_callback(lambda t: self.ingesting.get(ctx.guild.id, set()).discard(t))
+
+        if player.state is PlayerState.IDLE:
             await self.play_next(ctx)
         else:
+            self.prefetch(player)
             embed = discord.Embed(
                 title="🎶 Playlist Added to Queue",
                 description=f"**Playlist Name:** [{info['title']}]({playlist_url})\n"
-                            f"**Total Songs Added:** `{len(info['entries'])}`",
+                            f"**Songs Added:** `{len(tracks)}`"
+                            f"{' (loading the rest...)' if len(tracks) == PLAYLIST_PAGE_SIZE else ''}",
                 color=discord.Color.blue()
             )
             embed.set_thumbnail(url=info.get('thumbnail', ''))
-            embed.set_footer(text="Now playing the first song in the playlist")
+            embed.set_footer(text="Use /queue to view the full queue")
             await ctx.send(embed=embed)
 
+    async def ingest_playlist(self, ctx, player, pages, tracks):
+        """Enqueue the remaining playlist pages from their flat entries.
 
-    async def play_next(self, ctx):
-        if music_queue:
-            song = music_queue.pop(0)
-            ctx.voice_client.play(song['source'], after=lambda e: asyncio.run_coroutine_threadsafe(self.play_next(ctx), self.bot.loop))
-            embed = discord.Embed(
-                title="Now Playing",
-                description=f"**Title:** {song['title']}\n**Duration:** {song['duration']}",
-                color=discord.Color.red()
-            )
-            await ctx.send(embed=embed, view=MusicControlView(ctx, self))
+        Entries are not resolved here: stream URLs expire after a few hours, so
+        they are only warmed just ahead of playback by `prefetch`.
+        """
+        queued = list(tracks)
+        try:
+            async for info in pages:
+                for entry in info['entries']:
+                    track = make_track(entry)
+                    player.enqueue(track)
+                    queued.append(track)
+        except Exception as e:
+            print(e)
+        if len(queued) > len(tracks):
+            await ctx.send(f"🎶 Finished loading the playlist: `{len(queued)}` songs queued.")
+
+    def stop_ingesting(self, guild_id):
+        for task in self.ingesting.pop(guild_id, ()):
+            task.cancel()
+
+
+    async def open_source(self, song):
+        """Audio source for a song, from the local cache or its (refreshed) stream."""
+        mode = 'pcm' if GAPLESS_CROSSFADE else AUDIO_MODE
+        local = self.audio_cache.path(song['id'])
+        if local is not None:
+            info = None
+            if mode == 'pcm':
+                source = discord.FFmpegPCMAudio(local)
+            else:
+                source = discord.FFmpegOpusAudio(local, codec='copy')
         else:
-            embed = discord.Embed(title="Queue is empty, add more songs!", color=discord.Color.red())
-            await ctx.send(embed=embed)
+            # Re-resolves transparently if the stream URL expired while queued
+            info = await self.resolver.stream(song)
+            source = await make_source(info, ffmpeg_opts, mode)
+        self.audio_cache.record_play(song['id'], info)
+        return source
+
+    async def play_next(self, ctx, ended_at=None):
+        player = self.players.get(ctx.guild.id)
+        if player.state is PlayerState.RESOLVING:
+            return  # the resolve under way starts the next song when it's done
+        player.chain = None
+        voice_client = ctx.guild.voice_client
+        if voice_client is None:
+            player.set_state(PlayerState.IDLE)
+            return
+        while True:
+            song = player.dequeue()
+            if song is None:
+                player.set_state(PlayerState.IDLE)
+                embed = discord.Embed(title="Queue is empty, add more songs!", color=discord.Color.red())
+                await ctx.send(embed=embed)
+                return
+            player.set_state(PlayerState.RESOLVING)
+            try:
+                source = await self.open_source(song)
+            except Exception as e:
+                print(e)
+                await ctx.send(f"Couldn't load **{song['title']}**, skipping it.")
+                continue
+            if player.current is not song:
+                # Skipped while it was being resolved
+                source.cleanup()
+                continue
+            break
+        if not voice_client.is_connected():
+            # Disconnected while the song was being resolved
+            source.cleanup()
+            player.set_state(PlayerState.IDLE)
+            return
+        loop = self.bot.loop
+        chain = TrackChain(
+            source, song.get('seconds'), tag=song, ended_at=ended_at,
+            on_due=(lambda: loop.call_soon_threadsafe(self.schedule_prepare, player)) if GAPLESS else None,
+            on_transition=lambda tag, latency: loop.call_soon_threadsafe(self.on_transition, ctx, player, tag, latency),
+            lead=GAPLESS_LEAD, crossfade=GAPLESS_CROSSFADE,
+        )
+        try:
+            voice_client.play(chain, after=lambda e: asyncio.run_coroutine_threadsafe(self.play_next(ctx, time.perf_counter()), loop))
+        except Exception as e:
+            print(e)
+            chain.cleanup()
+            player.set_state(PlayerState.IDLE)
+            await ctx.send(f"Couldn't play **{song['title']}**.")
+            return
+        player.chain = chain
+        player.set_state(PlayerState.PLAYING)
+        await self.now_playing(ctx, player, song)
+
+    async def now_playing(self, ctx, player, song):
+        embed = discord.Embed(
+            title="Now Playing",
+            description=f"**Title:** {song['title']}\n**Duration:** {song['duration']}",
+            color=discord.Color.red()
+        )
+        await ctx.send(embed=embed, view=music_controls(ctx.guild.id))
+        self.prefetch(player)
+
+    def schedule_prepare(self, player):
+        task = asyncio.create_task(self.prepare_next(player))
+        self.prefetching.add(task)
+        task.add_done_callback(self._prefetch_done)
+
+    async def prepare_next(self, player):
+        """Start and buffer the next song so the chain can switch to it without a gap."""
+        chain = player.chain
+        if chain is None or not player.queue:
+            return
+        song = player.queue[0]
+        source = await self.open_source(song)
+        if player.chain is not chain or not player.queue or player.queue[0] is not song:
+            source.cleanup()  # the queue changed while we were resolving
+            return
+        buffered = PrebufferedSource(source)
+        if not chain.set_next(buffered, song.get('seconds'), tag=song):
+            buffered.cleanup()  # Opus/PCM mismatch, the after callback will handle it
+
+    def on_transition(self, ctx, player, song, latency):
+        player.record_transition(latency)
+        if song is player.current:
+            return
+        # The chain switched to a prepared song on its own
+        if player.queue and player.queue[0] is song:
+            player.dequeue()
+        else:
+            player.current = song
+        player.set_state(PlayerState.PLAYING)
+        task = asyncio.create_task(self.now_playing(ctx, player, song))
+        self.prefetching.add(task)
+        task.add_done_callback(self._prefetch_done)
 
     @commands.command(name='skip')
     async def skip(self, ctx):
-        voice_client = ctx.message.guild.voice_client
-        if voice_client.is_playing():
-            voice_client.stop()
-        await self.play_next(ctx)
+        if not self.skip_current(ctx.guild):
+            await self.play_next(ctx)
+
+    def skip_current(self, guild) -> bool:
+        """Skip the song playing in `guild`; False if nothing is playing."""
+        voice_client = guild.voice_client
+        player = self.players.get(guild.id)
+        if player.state is PlayerState.RESOLVING and player.current is not None:
+            player.current = None  # play_next drops it once resolved and moves on
+            return True
+        if voice_client is not None and voice_client.is_playing() and player.chain is not None and player.chain.skip():
+            return True  # the chain switches to the buffered next song on its next read
+        if voice_client is not None and (voice_client.is_playing() or voice_client.is_paused()):
+            voice_client.stop()  # the after callback starts the next song
+            return True
+        return False
 
     @commands.command(name="queue")
     async def queue(self, ctx):
-        if music_queue:
+        player = self.players.get(ctx.guild.id)
+        if player.queue:
             embed = discord.Embed(
                 title="🎶 Current Music Queue 🎶",
                 color=discord.Color.blue()
             )
-            for idx, song in enumerate(music_queue, start=1):
+            for idx, song in enumerate(player.upcoming(25), start=1):  # Embeds hold at most 25 fields
                 embed.add_field(
                     name=f"{idx}. {song['title']}",
                     value=f"**Duration:** {song['duration']}",
                     inline=False
                 )
-            embed.set_footer(text=f"Total songs in queue: {len(music_queue)}")
+            footer = f"Total songs in queue: {len(player)}"
+            if player.transitions:
+                footer += f" • Last track change: {player.transitions[-1] * 1000:.0f} ms"
+            embed.set_footer(text=footer)
             await ctx.send(embed=embed)
         else:
             embed = discord.Embed(
@@ -204,55 +440,86 @@ class MusicCog(commands.Cog):
 
     @commands.command(name="clear")
     async def clear(self, ctx):
-        global music_queue
-        music_queue = []
+        self.stop_ingesting(ctx.guild.id)
+        player = self.players.get(ctx.guild.id)
+        player.clear()
+        if player.chain is not None:
+            player.chain.clear_next()
         await ctx.send("Music queue cleared!")
 
+    @commands.command(name="remove")
+    async def remove(self, ctx, index: int):
+        player = self.players.get(ctx.guild.id)
+        if not 1 <= index <= len(player):
+            await ctx.send(f"There is no song at position {index}.")
+            return
+        song = player.remove(index - 1)
+        if index == 1 and player.chain is not None:
+            player.chain.clear_next()  # it may already be buffered
+        await ctx.send(f"Removed **{song['title']}** from the queue.")
+
     @commands.command(name="search")
     async def search(self, ctx, *, query: str):
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'quiet': True,
-            'default_search': 'ytsearch2',  # Set to 'ytsearch2' to limit the search to 2 results
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(query, download=False)
-            results = info['entries']
-            if not results:
-                embed = discord.Embed(
-                    title="🔍 YouTube Search Results",
-                    description=f"No results found for '{query}'.",
-                    color=discord.Color.red()
-                )
-                await ctx.send(embed=embed)
-                return
+        results = await self.resolver.search(query, 2)  # Limit the search to 2 results
+        if not results:
             embed = discord.Embed(
-                title=f"🔍 Top 2 YouTube Results for '{query}'",
-                color=discord.Color.green()
+                title="🔍 YouTube Search Results",
+                description=f"No results found for '{query}'.",
+                color=discord.Color.red()
             )
-            for idx, entry in enumerate(results[:2], start=1):  # Only process the first 2 results
-                title = entry['title']
-                duration = entry.get('duration')
-                duration_formatted = f"{duration // 60}:{duration % 60:02d}" if duration else "N/A"
-                url = entry['webpage_url']
-                embed.add_field(
-                    name=f"{idx}. {title}",
-                    value=f"**Duration:** {duration_formatted}\n[Watch]({url})",
-                    inline=False
-                )
             await ctx.send(embed=embed)
+            return
+        embed = discord.Embed(
+            title=f"🔍 Top 2 YouTube Results for '{query}'",
+            color=discord.Color.green()
+        )
+        for idx, entry in enumerate(results[:2], start=1):  # Only process the first 2 results
+            title = entry['title']
+            url = entry.get('webpage_url') or entry['url']
+            embed.add_field(
+                name=f"{idx}. {title}",
+                value=f"**Duration:** {format_duration(entry.get('duration'))}\n[Watch]({url})",
+                inline=False
+            )
+        await ctx.send(embed=embed)
+
 
+    async def add_to_queue(self, player, url: str):
+        info = await self.resolver.resolve(url)
+        track = make_track(info, url)
+        player.enqueue(track)
+        return track
 
-    def add_to_queue(self, url: str):
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'quiet': True,
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            duration = str(info['duration'] // 60) + ":" + str(info['duration'] % 60)
-            source = discord.FFmpegPCMAudio(info['url'], **ffmpeg_opts)
-            music_queue.append({'title': info['title'], 'duration': duration, 'source': source})
+    async def enqueue_batch(self, player, urls):
+        """Resolve URLs concurrently and enqueue them in the given order.
+
+        Returns the queued tracks and the URLs that failed to resolve.
+        """
+        results = await self.resolver.resolve_many(urls, limit=BATCH_RESOLVE_CONCURRENCY)
+        tracks, failed = [], []
+        for url, info in zip(urls, results):
+            if isinstance(info, Exception):
+                print(f'Could not resolve {url}: {info}')
+                failed.append(url)
+            else:
+                track = make_track(info, url)
+                player.enqueue(track)
+                tracks.append(track)
+        return tracks, failed
+
+    def prefetch(self, player):
+        """Warm the stream URLs of the next PREFETCH_WINDOW songs without spawning ffmpeg."""
+        for song in player.upcoming(PREFETCH_WINDOW):
+            if self.resolver.cache.get_stream(song['id']) is None:
+                task = asyncio.create_task(self.resolver.stream(song))
+                self.prefetching.add(task)
+                task.add_done_callback(self._prefetch_done)
+
+    def _prefetch_done(self, task):
+        self.prefetching.discard(task)
+        # A failed prefetch is retried by play_next, just consume the error
+        if not task.cancelled():
+            task.exception()
 
     @commands.command(name="jalel")
     async def jalel(self, ctx):
@@ -271,9 +538,17 @@ class MusicCog(commands.Cog):
             'https://www.youtube.com/watch?v=JEWWmx8jKCk'
         ]
         shuffle(urls)
-        await self.play(ctx, urls[0])
-        for url in urls[1:4]:
-            self.add_to_queue(url)
+        await self.join(ctx)
+        if ctx.voice_client is None:
+            return
+        player = self.players.get(ctx.guild.id)
+        tracks, failed = await self.enqueue_batch(player, urls[:4])
+        if failed:
+            await ctx.send(f"Couldn't load {len(failed)} of the songs, queued the other {len(tracks)}.")
+        if player.state is PlayerState.IDLE:
+            await self.play_next(ctx)
+        else:
+            await ctx.send(f"🎵 Added `{len(tracks)}` songs to the queue.")
 
 
 
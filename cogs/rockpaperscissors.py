@@ -2,6 +2,7 @@ import discord
 from discord import ButtonStyle, Interaction, Embed
 from discord.ext import commands
 from discord.ui import Button, View
+from utils.sessions import SessionLimitError, SessionRegistry
 
 class RPSGame:
     def __init__(self):
@@ -33,7 +34,7 @@ class RPSGame:
 
 class RPSView(View):
     def __init__(self, game):
-        super().__init__(timeout=None)
+        super().__init__(timeout=None)  # Idle games are evicted by the cog's SessionRegistry
         self.game = game
 
     @discord.ui.button(label='Rock', style=ButtonStyle.grey, emoji='🧱')
@@ -82,14 +83,34 @@ class RPSView(View):
 class RPS(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.sessions = SessionRegistry('rps')
+
+    async def cog_load(self):
+        self.sessions.start()
+
+    async def cog_unload(self):
+        self.sessions.close()
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction):
+        if interaction.message is not None:
+            self.sessions.touch(interaction.message.id)
 
     @commands.command(name="rps")
     async def start_rps(self, ctx):
-        self.game = RPSGame()
-        self.view = RPSView(self.game)
+        guild_id = ctx.guild.id if ctx.guild else None
+        try:
+            self.sessions.check(guild_id, ctx.author.id)
+        except SessionLimitError as e:
+            await ctx.send(str(e))
+            return
+
+        game = RPSGame()
+        view = RPSView(game)
 
-        self.game.add_player(ctx.author)
-        await ctx.send("Rock-Paper-Scissors game started! Another player must join!", view=self.view)
+        game.add_player(ctx.author)
+        message = await ctx.send("Rock-Paper-Scissors game started! Another player must join!", view=view)
+        self.sessions.add(message, view, guild_id, ctx.author.id)
 
 async def setup(bot):
     await bot.add_cog(RPS(bot))
\ No newline at end of file
@@ -1,59 +1,134 @@
+import os
 import random
-import json
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 import discord
+from discord import ButtonStyle, Interaction
 from discord.ext import commands
+from discord.ui import Button, View
 import asyncio
+from utils.charts import render_stats_chart, top_players
+from utils.edits import schedule_edit
+from utils.stats_store import StatsCache, StatsStore
 
-# Path to the JSON file for storing data
+# SQLite database holding the statistics
+STATS_DB = 'russian_roulette_stats.db'
+
+# Legacy JSON stats file, imported once into the database
 STATS_FILE = 'russian_roulette_stats.json'
 
-def load_stats():
-    """Load the game statistics from a JSON file."""
-    try:
-        with open(STATS_FILE, 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {}
-
-def save_stats(stats):
-    """Save the game statistics to a JSON file."""
-    with open(STATS_FILE, 'w') as file:
-        json.dump(stats, file, indent=4)
-
-def update_stats(member, stats, disconnected=False):
-    """Update statistics for a member."""
-    user_id = str(member.id)
-    if user_id not in stats:
-        stats[user_id] = {'games_played': 0, 'times_disconnected': 0, 'name': member.display_name}
-    stats[user_id]['games_played'] += 1
-    if disconnected:
-        stats[user_id]['times_disconnected'] += 1
-    return stats
+# Seconds between batched writes of changed stats
+FLUSH_INTERVAL = 30
+
+# Players drawn individually on /rr_graph, the rest are grouped as "Others"
+GRAPH_TOP_N = 15
+
+# Players shown per /rr_stats leaderboard page
+LEADERBOARD_PAGE_SIZE = 10
+
+class LeaderboardView(View):
+    """Paginated /rr_stats leaderboard served from the guild's ranking index."""
+
+    def __init__(self, stats, guild_id, page=0):
+        super().__init__(timeout=180)
+        self.stats = stats
+        self.guild_id = guild_id
+        self.page = page
+        self.message = None
+        self.update_buttons()
+
+    def page_count(self):
+        players = len(self.stats.ranking(self.guild_id))
+        return max(1, -(-players // LEADERBOARD_PAGE_SIZE))
+
+    def update_buttons(self):
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= self.page_count() - 1
+
+    def build_embed(self):
+        guild_stats = self.stats.guild_stats(self.guild_id)
+        ranking = self.stats.ranking(self.guild_id)
+        embed = discord.Embed(title="Game Statistics for All Users", description="Overview of all participation in Russian Roulette:", color=discord.Color.blue())
+        for rank, user_id in ranking.page(self.page * LEADERBOARD_PAGE_SIZE, LEADERBOARD_PAGE_SIZE):
+            user_stats = guild_stats[str(user_id)]
+            embed.add_field(name=f"#{rank} {user_stats['name']}", value=f"Games Played: {user_stats['games_played']}\nTimes Disconnected: {user_stats['times_disconnected']}", inline=False)
+        embed.set_footer(text=f"Page {self.page + 1}/{self.page_count()} • {len(ranking)} players")
+        return embed
+
+    async def show_page(self, interaction: Interaction, page: int):
+        self.page = max(0, min(page, self.page_count() - 1))
+        self.update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(emoji="◀️", style=ButtonStyle.grey)
+    async def previous_page(self, interaction: Interaction, button: Button):
+        await self.show_page(interaction, self.page - 1)
+
+    @discord.ui.button(emoji="▶️", style=ButtonStyle.grey)
+    async def next_page(self, interaction: Interaction, button: Button):
+        await self.show_page(interaction, self.page + 1)
+
+    @discord.ui.button(label="My rank", style=ButtonStyle.primary)
+    async def my_rank(self, interaction: Interaction, button: Button):
+        ranking = self.stats.ranking(self.guild_id)
+        rank = ranking.rank(interaction.user.id)
+        if rank is None:
+            await interaction.response.send_message("You haven't played Russian Roulette here yet!", ephemeral=True)
+            return
+        user_stats = self.stats.guild_stats(self.guild_id)[str(interaction.user.id)]
+        await interaction.response.send_message(f"You are **#{rank}** of {len(ranking)} with {user_stats['games_played']} games played.", ephemeral=True)
+
+    async def on_timeout(self):
+        for child in self.children:
+            child.disabled = True
+        if self.message is not None:
+            await self.message.edit(view=self)
+
 
 class RussianRoulette(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-
+        # Stats from the JSON file had no guild: they are imported under this one, once it is set
+        legacy_guild_id = os.getenv("rr_legacy_guild_id")
+        legacy_guild_id = int(legacy_guild_id) if legacy_guild_id else None
+        self.store = StatsStore(STATS_DB, legacy_json=STATS_FILE, legacy_guild_id=legacy_guild_id)
+        self.stats = StatsCache(self.store, flush_interval=FLUSH_INTERVAL)
+        self.renderer = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        self.charts = {}  # guild_id -> (stats version, future of PNG bytes)
+
+    async def cog_load(self):
+        await self.store.open()
+        await self.stats.load()
+
+    async def cog_unload(self):
+        self.renderer.shutdown(wait=False, cancel_futures=True)
+        await self.stats.close()
+        await self.store.close()
+
+    def render_chart(self, guild_id):
+        """PNG of a guild's chart, rendered at most once per stats version."""
+        version = self.stats.version(guild_id)
+        cached = self.charts.get(guild_id)
+        stale = cached is None or cached[0] != version
+        if not stale and cached[1].done():
+            stale = cached[1].cancelled() or cached[1].exception() is not None  # retry failed renders
+        if stale:
+            rows = top_players(self.stats.guild_stats(guild_id), GRAPH_TOP_N)
+            future = asyncio.get_running_loop().run_in_executor(self.renderer, render_stats_chart, rows)
+            cached = self.charts[guild_id] = (version, future)
+        return asyncio.shield(cached[1])
+
+    @commands.guild_only()
     @commands.command(name="rr_stats", help="Display Russian Roulette game statistics for all users.")
     async def show_stats(self, ctx):
         """Show the statistics of the Russian Roulette game for all users."""
-        stats = load_stats()
-        if not stats:
+        if not self.stats.guild_stats(ctx.guild.id):
             await ctx.send("No game statistics available yet.")
             return
 
-        embed = discord.Embed(title="Game Statistics for All Users", description="Overview of all participation in Russian Roulette:", color=discord.Color.blue())
-
-        sorted_stats = sorted(stats.items(), key=lambda x: x[1]['games_played'], reverse=True)
-
-        for user_id, user_stats in sorted_stats:
-            embed.add_field(name=user_stats['name'], value=f"Games Played: {user_stats['games_played']}\nTimes Disconnected: {user_stats['times_disconnected']}", inline=False)
-
-        await ctx.send(embed=embed)
+        view = LeaderboardView(self.stats, ctx.guild.id)
+        view.message = await ctx.send(embed=view.build_embed(), view=view)
 
     @commands.command(name="rr", help="Russian Roulette: Disconnects a random user from the voice channel with enhanced visual effects.")
     async def russian_roulette(self, ctx):
@@ -67,83 +142,48 @@ class RussianRoulette(commands.Cog):
             await ctx.send(embed=discord.Embed(title="Russian Roulette", description="Not enough players in the voice channel!", color=discord.Color.orange()))
             return
 
-        stats = load_stats()
-
         # Enhanced countdown using embeds
         embed = discord.Embed(title="🎲 Russian Roulette", description="Starting Russian Roulette in 3...", color=discord.Color.blue())
         countdown_message = await ctx.send(embed=embed)
         for second in range(2, 0, -1):
             await asyncio.sleep(1)
             embed.description = f"Starting Russian Roulette in {second}..."
-            await countdown_message.edit(embed=embed)
+            schedule_edit(countdown_message, embed=embed.copy())
         await asyncio.sleep(1)
         embed.description = "🎯 **FIRE!**"
-        await countdown_message.edit(embed=embed)
+        schedule_edit(countdown_message, embed=embed.copy())
 
         await asyncio.sleep(1)
         chosen_member = random.choice(members)
         for member in members:
-            update_stats(member, stats, disconnected=(member == chosen_member))
-        save_stats(stats)
+            self.stats.update_stats(ctx.guild.id, member, disconnected=(member == chosen_member))
 
         for _ in range(3):  # Number of cycles through names for dramatic effect
             for member in members:
                 embed.description = f"Selecting... {member.display_name}"
-                await countdown_message.edit(embed=embed)
+                schedule_edit(countdown_message, embed=embed.copy())  # Frames the channel can't keep up with are dropped
                 await asyncio.sleep(0.5)  # Adjust timing for effect
 
         # Final selection display
         embed = discord.Embed(title="⚡️ Selected for Disconnection", description=f"{chosen_member.mention} has been selected!", color=discord.Color.gold())
-        await countdown_message.edit(embed=embed)
+        await schedule_edit(countdown_message, embed=embed)
         await asyncio.sleep(1)  # Dramatic pause
 
         # Disconnect the selected member
         await chosen_member.move_to(None)
         embed = discord.Embed(title="🚪 Disconnected", description=f"{chosen_member.display_name} has been disconnected from the voice channel!", color=discord.Color.green())
-        await countdown_message.edit(embed=embed)
+        await schedule_edit(countdown_message, embed=embed)
 
+    @commands.guild_only()
     @commands.command(name="rr_graph", help="Displays a graphical view of Russian Roulette statistics.")
     async def show_graph(self, ctx):
-        stats = load_stats()
+        stats = self.stats.guild_stats(ctx.guild.id)
         if not stats:
             await ctx.send("No game statistics available yet.")
             return
 
-        # Convert the dictionary to a DataFrame
-        data = pd.DataFrame.from_dict(stats, orient='index')
-        data.reset_index(drop=True, inplace=True)
-        data.columns = ['Games Played', 'Times Disconnected', 'Name']
-
-        # Setting up the plotting
-        sns.set(style="whitegrid")
-        fig, ax = plt.subplots(figsize=(10, 5))
-
-        # Create bars for "Games Played"
-        bar1 = sns.barplot(x='Name', y='Games Played', data=data, color='deepskyblue', label='Games Played')
-
-        # Create bars for "Times Disconnected"
-        bar2 = sns.barplot(x='Name', y='Times Disconnected', data=data, color='tomato', label='Times Disconnected')
-
-        # Adding labels
-        for bar in bar1.containers:
-            bar1.bar_label(bar, label_type='edge', fontsize=9, color='black', fontweight='bold')
-            
-        for bar in bar2.containers:
-            bar2.bar_label(bar, label_type='edge', fontsize=9, color='black', fontweight='bold')
-
-        # Adding final touches to the plot
-        plt.xlabel('Player Names')
-        plt.ylabel('Count')
-        plt.title('Games Played and Disconnections per Player in Russian Roulette')
-        plt.legend()
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # Save plot to a bytes buffer
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png')
-        buffer.seek(0)
-        plt.close(fig)
+        png = await self.render_chart(ctx.guild.id)
+        buffer = BytesIO(png)
 
         # Send plot in discord
         file = discord.File(fp=buffer, filename='russian_roulette_stats.png')
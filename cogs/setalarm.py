@@ -1,39 +1,97 @@
+import os
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import discord
 from discord.ext import commands
-from datetime import datetime, timedelta
-import asyncio
+from utils.alarms import REPEATS, AlarmScheduler
+
+ALARMS_FILE = os.getenv("alarms_file", "alarms.json")
+MAX_ALARMS_PER_USER = 25
+
+
+def parse_zone(name):
+    if name.upper() == 'UTC':
+        name = 'UTC'
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+DEFAULT_TIMEZONE = os.getenv("alarm_timezone") or os.getenv("TZ") or "UTC"
+if parse_zone(DEFAULT_TIMEZONE) is None:
+    DEFAULT_TIMEZONE = "UTC"
 
 
 class setalarm(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.alarms = AlarmScheduler(ALARMS_FILE, self.ring)
 
-    @commands.command(name='setalarm')
-    async def set_alarm(ctx, time: str, name):
+    async def cog_load(self):
+        await self.alarms.start()
 
-        try:
+    async def cog_unload(self):
+        await self.alarms.close()
 
-            alarm_time = datetime.strptime(time, "%H:%M").time()
+    async def ring(self, alarm):
+        channel = self.bot.get_channel(alarm.channel_id)
+        if channel is None:
+            channel = await self.bot.fetch_channel(alarm.channel_id)
+        await channel.send(f'<@{alarm.user_id}> Alarm! {alarm.name}.')
 
-            now = datetime.now().time()
-            
-            now_seconds = now.hour * 3600 + now.minute * 60 + now.second
-            alarm_seconds = alarm_time.hour * 3600 + alarm_time.minute * 60
-            
-            if alarm_seconds <= now_seconds:
-                alarm_seconds += 86400
-            
-            wait_time = alarm_seconds - now_seconds
-            
-            wait_time = timedelta(seconds=wait_time)
-            
-            await ctx.send(f'Alarm set for {time}.')
-            
-            await asyncio.sleep(wait_time.total_seconds())
-            
-            await ctx.send(f'{ctx.author.mention} Alarm! {name}.')
-            
+    @commands.command(name='setalarm', help="Set an alarm: /setalarm hh:mm [daily|weekdays|weekly] [Area/City] name")
+    async def set_alarm(self, ctx, time: str, *, name: str = 'Alarm'):
+        try:
+            alarm_time = datetime.strptime(time, "%H:%M").time()
         except ValueError:
             await ctx.send("Invalid time format. Please use hh:mm format.")
+            return
+
+        # Optional leading words: a recurrence and/or an IANA timezone
+        words = name.split()
+        repeat = None
+        tz = DEFAULT_TIMEZONE
+        if words and words[0].lower() in REPEATS:
+            repeat = words.pop(0).lower()
+        if words and ('/' in words[0] or words[0].upper() == 'UTC'):
+            if parse_zone(words[0]) is None:
+                await ctx.send(f"Unknown timezone `{words[0]}`. Use a name like `Europe/Paris`.")
+                return
+            tz = parse_zone(words.pop(0)).key
+        name = ' '.join(words) or 'Alarm'
+
+        if len(self.alarms.for_user(ctx.author.id)) >= MAX_ALARMS_PER_USER:
+            await ctx.send(f"You already have {MAX_ALARMS_PER_USER} alarms. Cancel one with /cancelalarm first.")
+            return
+
+        alarm = self.alarms.add(ctx.author.id, ctx.channel.id, name, alarm_time.hour, alarm_time.minute, tz, repeat)
+        when = f' ({repeat})' if repeat else ''
+        await ctx.send(f'Alarm #{alarm.id} set for {time} {tz}{when}, next <t:{int(alarm.due)}:R>.')
+
+    @commands.command(name='alarms', help="List your alarms.")
+    async def list_alarms(self, ctx):
+        alarms = self.alarms.for_user(ctx.author.id)
+        if not alarms:
+            await ctx.send("You have no alarms.")
+            return
+
+        embed = discord.Embed(title="⏰ Your alarms", color=discord.Color.blue())
+        for alarm in alarms:
+            when = f' ({alarm.repeat})' if alarm.repeat else ''
+            embed.add_field(
+                name=f"#{alarm.id} {alarm.name}",
+                value=f"{alarm.hour:02d}:{alarm.minute:02d} {alarm.tz}{when}, next <t:{int(alarm.due)}:R>",
+                inline=False,
+            )
+        await ctx.send(embed=embed)
+
+    @commands.command(name='cancelalarm', help="Cancel one of your alarms by its number.")
+    async def cancel_alarm(self, ctx, alarm_id: int):
+        if self.alarms.cancel(alarm_id, user_id=ctx.author.id):
+            await ctx.send(f"Alarm #{alarm_id} cancelled.")
+        else:
+            await ctx.send(f"You have no alarm #{alarm_id}.")
 
 async def setup(bot):
-    await bot.add_cog(setalarm(bot))
\ No newline at end of file
+    await bot.add_cog(setalarm(bot))
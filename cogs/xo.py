@@ -1,7 +1,10 @@
+import asyncio
 import discord
 from discord import Client, ButtonStyle, Interaction, Embed
 from discord.ext import commands
 from discord.ui import Button, View
+from utils.sessions import SessionLimitError, SessionRegistry
+from utils.tictactoe import Engine
 
 
 
@@ -13,52 +16,51 @@ class TicTacToeButton(Button):
 
     async def callback(self, interaction: discord.Interaction):
         view: TicTacToe = self.view
+        if view.can_claim(interaction.user):
+            view.players[1] = interaction.user  # No room for a JOIN button: the first O move claims the seat
         if interaction.user != view.players[view.current_player]:
             await interaction.response.send_message("It's not your turn !", ephemeral=True)
             return
 
-        state = view.board[self.y][self.x]
-        if state in ('X', 'O'):
+        if not view.play(self.cell):
+            # The cell was taken by a move this client hasn't rendered yet: just show the current board
+            await interaction.response.edit_message(view=view)
             return
 
-        if view.current_player == 0:
-            self.style = discord.ButtonStyle.danger
-            self.label = 'X'
-            self.disabled = True
-            view.board[self.y][self.x] = 'X'
-            view.current_player = 1
-        else:
-            self.style = discord.ButtonStyle.success
-            self.label = 'O'
-            self.disabled = True
-            view.board[self.y][self.x] = 'O'
-            view.current_player = 0
-
-        winner = view.check_winner()
-        if winner is not None:
-            for child in view.children:
-                child.disabled = True
-            await interaction.response.edit_message(content=f'{view.players[winner].mention} **wins** !', view=view)
-        elif view.is_full():
-            for child in view.children:
-                child.disabled = True
-            await interaction.response.edit_message(content='It\'s a **tie** !', view=view)
-        else:
-            await interaction.response.edit_message(view=view)
+        if view.result is None and view.vs_bot:
+            view.play(view.engine.best_move(view.bits[1], view.bits[0]))
+        await view.redraw(interaction)
+
+    @property
+    def cell(self):
+        return self.y * self.view.engine.size + self.x
 
 
 class TicTacToe(View):
-    def __init__(self, player1):
-        super().__init__()
+    def __init__(self, player1, engine, opponent=None):
+        super().__init__(timeout=None)  # Idle games are evicted by the cog's SessionRegistry
+        self.engine = engine
         self.current_player = 0
-        self.board = [[None] * 3 for _ in range(3)]
-        self.players = [player1, None]
-        for y in range(3):
-            for x in range(3):
-                self.add_item(TicTacToeButton(x, y))
-        self.join_button = Button(label="JOIN", style=discord.ButtonStyle.primary)
-        self.join_button.callback = self.join_game
-        self.add_item(self.join_button)
+        self.bits = [0, 0]  # X and O bitboards
+        self.result = None  # 0 or 1 for the winner, 'tie' once the board is full
+        self.vs_bot = opponent is not None
+        self.players = [player1, opponent]
+        self.buttons = []
+        for y in range(engine.size):
+            for x in range(engine.size):
+                button = TicTacToeButton(x, y)
+                self.buttons.append(button)
+                self.add_item(button)
+        # A 5x5 board uses all 25 component slots
+        self.join_button = None
+        if not self.vs_bot and engine.size < 5:
+            self.join_button = Button(label="JOIN", style=discord.ButtonStyle.primary)
+            self.join_button.callback = self.join_game
+            self.add_item(self.join_button)
+
+    def can_claim(self, user):
+        return (self.join_button is None and self.players[1] is None
+                and self.current_player == 1 and user != self.players[0])
 
     async def join_game(self, interaction: discord.Interaction):
         if self.players[1] is None and interaction.user != self.players[0]:
@@ -68,34 +70,95 @@ class TicTacToe(View):
         else:
             await interaction.response.send_message("You can't join this game !", ephemeral=True)
 
-    def check_winner(self):
-        for line in self.board:
-            if line[0] == line[1] == line[2] and line[0] is not None:
-                return 0 if line[0] == 'X' else 1
-
-        for col in range(3):
-            if self.board[0][col] == self.board[1][col] == self.board[2][col] and self.board[0][col] is not None:
-                return 0 if self.board[0][col] == 'X' else 1
-
-        if self.board[0][0] == self.board[1][1] == self.board[2][2] and self.board[0][0] is not None:
-            return 0 if self.board[0][0] == 'X' else 1
-
-        if self.board[0][2] == self.board[1][1] == self.board[2][0] and self.board[0][2] is not None:
-            return 0 if self.board[0][2] == 'X' else 1
-
-        return None
+    def play(self, cell) -> bool:
+        """Place the current player's mark on `cell`; False if it is taken."""
+        bit = 1 << cell
+        if (self.bits[0] | self.bits[1]) & bit:
+            return False
+
+        player = self.current_player
+        self.bits[player] |= bit
+        button = self.buttons[cell]
+        button.style = discord.ButtonStyle.danger if player == 0 else discord.ButtonStyle.success
+        button.label = 'X' if player == 0 else 'O'
+        button.disabled = True
+
+        if self.engine.wins_with(self.bits[player], cell):
+            self.result = player
+        elif self.engine.is_full(*self.bits):
+            self.result = 'tie'
+        self.current_player = 1 - player
+        return True
+
+    async def redraw(self, interaction: discord.Interaction):
+        if self.result is None:
+            await interaction.response.edit_message(view=self)
+            return
 
-    def is_full(self):
-        return all(all(cell is not None for cell in row) for row in self.board)
+        for child in self.children:
+            child.disabled = True
+        self.stop()
+        if self.result == 'tie':
+            await interaction.response.edit_message(content='It\'s a **tie** !', view=self)
+        else:
+            await interaction.response.edit_message(content=f'{self.players[self.result].mention} **wins** !', view=self)
 
 class XO(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.sessions = SessionRegistry('xo')
+        self.engines = {}
+
+    async def cog_load(self):
+        # Solve the classic board up front so bot moves on it are table lookups
+        self.engines[(3, 3)] = await asyncio.to_thread(Engine(3).precompute)
+        self.sessions.start()
+
+    def engine(self, size, k):
+        engine = self.engines.get((size, k))
+        if engine is None:
+            engine = self.engines[(size, k)] = Engine(size, k).precompute()
+        return engine
+
+    async def cog_unload(self):
+        self.sessions.close()
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction):
+        if interaction.message is not None:
+            self.sessions.touch(interaction.message.id)
+
+    @commands.command(name='xo', help="Tic-Tac-Toe: /xo [bot] [size 3-5] [k in a row]")
+    async def tic_tac_toe(self, ctx, *options: str):
+        vs_bot = bool(options) and options[0].lower() in ('bot', 'ai')
+        numbers = options[1:] if vs_bot else options
+        try:
+            size = int(numbers[0]) if numbers else 3
+            k = int(numbers[1]) if len(numbers) > 1 else min(size, 4)
+        except ValueError:
+            await ctx.send("Usage: /xo [bot] [size 3-5] [k in a row]")
+            return
+        if not 3 <= size <= 5 or not 3 <= k <= size:
+            await ctx.send("The board must be 3x3 to 5x5, with 3 to size in a row to win.")
+            return
+
+        guild_id = ctx.guild.id if ctx.guild else None
+        try:
+            self.sessions.check(guild_id, ctx.author.id)
+        except SessionLimitError as e:
+            await ctx.send(str(e))
+            return
 
-    @commands.command(name='xo')
-    async def tic_tac_toe(self, ctx):
-        self.view = TicTacToe(ctx.author)
-        await ctx.send('Tic-Tac-Toe: **X** goes first. Click the button below to join as **O**.', view=self.view)
+        view = TicTacToe(ctx.author, self.engine(size, k), opponent=ctx.me if vs_bot else None)
+        rules = f' ({size}x{size}, {k} in a row)' if size != 3 else ''
+        if vs_bot:
+            intro = f'Tic-Tac-Toe{rules}: {ctx.author.mention}:regional_indicator_x: **VS** {ctx.me.mention}:regional_indicator_o: : you go first!'
+        elif view.join_button is None:
+            intro = f'Tic-Tac-Toe{rules}: **X** goes first. The first other player to move plays **O**.'
+        else:
+            intro = f'Tic-Tac-Toe{rules}: **X** goes first. Click the button below to join as **O**.'
+        message = await ctx.send(intro, view=view)
+        self.sessions.add(message, view, guild_id, ctx.author.id)
 
 
 
@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import time
+from contextlib import asynccontextmanager
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` burst, refilled at `rate` tokens per second."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        start = max(self.updated, self.blocked_until)
+        if now > start:
+            self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate)
+        self.updated = max(now, self.updated)
+
+    def available(self, now=None) -> bool:
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return self.tokens >= 1
+
+    def take(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= 1
+
+    def retry_after(self, now=None) -> float:
+        """Seconds until one token is available."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return max(self.blocked_until - now, 0.0) + (1 - self.tokens) / self.rate
+
+    def block(self, seconds: float):
+        """Drain the bucket and pause refilling for `seconds` (e.g. from a 429 retry-after)."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def is_full(self, now) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class Rejected(Exception):
+    """Raised when a request is refused; `retry_after` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: float = 0.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Rate limits and fair queueing in front of a shared upstream API.
+
+    Each request must find a token in its user, channel and guild buckets or
+    it is rejected outright. Admitted requests run while fewer than
+    `max_active` are in progress; the rest wait in a fair-share queue ordered
+    by per-user virtual start time, so a user with many queued prompts is
+    interleaved with everyone else instead of served back to back. When the
+    queue holds `max_queue` requests new ones are rejected. A shared provider
+    bucket gates dispatch and is blocked by `throttle()` when the upstream
+    answers 429.
+    """
+
+    def __init__(self, max_active=4, max_queue=20,
+                 user_rate=1 / 10, user_burst=3,
+                 channel_rate=1 / 3, channel_burst=6,
+                 guild_rate=1 / 2, guild_burst=10,
+                 provider_rate=0.5, provider_burst=30):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.limits = {
+            'user': (user_rate, user_burst),
+            'channel': (channel_rate, channel_burst),
+            'guild': (guild_rate, guild_burst),
+        }
+        self.buckets = {scope: {} for scope in self.limits}
+        self.provider = TokenBucket(provider_rate, provider_burst)
+        self.queue = []  # heap of (virtual_start, seq, user_id, future)
+        self.seq = 0
+        self.virtual_time = 0.0
+        self.user_finish = {}
+        self.active = 0
+        self.wakeup = None
+
+    def _bucket(self, scope, key):
+        buckets = self.buckets[scope]
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) > 10000:
+                now = time.monotonic()
+                for stale in [k for k, b in buckets.items() if b.is_full(now)]:
+                    del buckets[stale]
+            bucket = buckets[key] = TokenBucket(*self.limits[scope])
+        return bucket
+
+    def _charge(self, user_id, channel_id, guild_id):
+        now = time.monotonic()
+        scoped = [('user', user_id), ('channel', channel_id), ('guild', guild_id)]
+        buckets = [(scope, self._bucket(scope, key)) for scope, key in scoped if key is not None]
+        for scope, bucket in buckets:
+            if not bucket.available(now):
+                raise Rejected(f'{scope} rate limit', bucket.retry_after(now))
+        for _, bucket in buckets:
+            bucket.take(now)
+
+    def position(self, future) -> int:
+        """1-based position of a queued request in dispatch order."""
+        for index, entry in enumerate(sorted(self.queue), start=1):
+            if entry[3] is future:
+                return index
+        return 0
+
+    def throttle(self, retry_after: float):
+        """Feed an upstream 429 back into the provider bucket."""
+        self.provider.block(retry_after)
+
+    def _dispatch(self):
+        while self.queue and self.active < self.max_active:
+            if not self.provider.available():
+                self._schedule_wakeup(self.provider.retry_after())
+                return
+            start, _, user_id, future = heapq.heappop(self.queue)
+            if future.done():
+                continue
+            self.virtual_time = max(self.virtual_time, start)
+            self.provider.take()
+            self.active += 1
+            future.set_result(None)
+        if not self.queue:
+            # Forget users whose virtual finish is behind the clock
+            self.user_finish = {u: f for u, f in self.user_finish.items() if f > self.virtual_time}
+
+    def _schedule_wakeup(self, delay):
+        if self.wakeup is None:
+            def wake():
+                self.wakeup = None
+                self._dispatch()
+            self.wakeup = asyncio.get_running_loop().call_later(delay, wake)
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id, channel_id=None, guild_id=None, on_queued=None):
+        """Hold one upstream slot for the duration of the block.
+
+        Raises Rejected when a bucket is empty or the queue is full. If the
+        request has to wait, `on_queued(position)` is awaited once.
+        """
+        if len(self.queue) >= self.max_queue:
+            raise Rejected('queue full', 5.0)
+        self._charge(user_id, channel_id, guild_id)
+
+        start = max(self.virtual_time, self.user_finish.get(user_id, 0.0))
+        self.user_finish[user_id] = start + 1
+        future = asyncio.get_running_loop().create_future()
+        self.seq += 1
+        heapq.heappush(self.queue, (start, self.seq, user_id, future))
+        self._dispatch()
+
+        try:
+            if not future.done() and on_queued is not None:
+                await on_queued(self.position(future))
+            await future
+        except BaseException:
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+                self.queue = [entry for entry in self.queue if entry[3] is not future]
+                heapq.heapify(self.queue)
+            raise
+        try:
+            yield
+        finally:
+            self._release()
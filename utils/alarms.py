@@ -0,0 +1,218 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+REPEATS = ('daily', 'weekdays', 'weekly')
+
+# The dispatcher never sleeps longer than this, so wall-clock jumps
+# (NTP corrections, suspend/resume) are picked up quickly
+MAX_SLEEP = 60.0
+
+
+def next_occurrence(hour: int, minute: int, tz: str, repeat=None, after=None) -> float:
+    """UTC timestamp of the next `hh:mm` wall-clock time in `tz` strictly after `after`.
+
+    Recurring alarms are computed from local dates, so they keep their
+    wall-clock time across DST changes.
+    """
+    zone = ZoneInfo(tz)
+    after = time.time() if after is None else after
+    now = datetime.fromtimestamp(after, zone)
+    candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate.timestamp() <= after:
+        candidate = _shift(candidate, zone, 1)
+    if repeat == 'weekdays':
+        while candidate.weekday() >= 5:
+            candidate = _shift(candidate, zone, 1)
+    return candidate.timestamp()
+
+
+def _shift(moment, zone, days):
+    # Move by calendar days and re-attach the zone so the UTC offset is recomputed
+    moment = moment.replace(tzinfo=None) + timedelta(days=days)
+    return moment.replace(tzinfo=zone)
+
+
+class Alarm:
+    """A scheduled alarm. Kept deliberately small: thousands of these cost a few hundred KB."""
+
+    __slots__ = ('id', 'user_id', 'channel_id', 'name', 'hour', 'minute', 'tz', 'repeat', 'due')
+
+    def __init__(self, id, user_id, channel_id, name, hour, minute, tz, repeat=None, due=0.0):
+        self.id = id
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.name = name
+        self.hour = hour
+        self.minute = minute
+        self.tz = tz
+        self.repeat = repeat
+        self.due = due
+
+    def to_dict(self) -> dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**{slot: data[slot] for slot in cls.__slots__ if slot in data})
+
+    def reschedule(self):
+        """Advance a recurring alarm past now; weekly alarms keep their weekday."""
+        now = time.time()
+        if self.repeat == 'weekly':
+            due = self.due
+            while due <= now:
+                due = next_occurrence(self.hour, self.minute, self.tz, after=due + 6 * 86400)
+            self.due = due
+        else:
+            self.due = next_occurrence(self.hour, self.minute, self.tz, self.repeat, after=now)
+
+
+class AlarmScheduler:
+    """All alarms driven by one dispatcher task and a min-heap of due times.
+
+    Cancelled or rescheduled alarms leave stale heap entries behind; they are
+    skipped when popped rather than searched for. Every change is saved to
+    `path` as JSON (written to a temp file, then renamed over the old one)
+    and reloaded by `start`. Alarms that came due while the bot was offline
+    fire right after startup.
+    """
+
+    def __init__(self, path, on_fire):
+        self.path = path
+        self.on_fire = on_fire
+        self.alarms = {}
+        self.heap = []
+        self.ids = itertools.count(1)
+        self.wake = asyncio.Event()
+        self.dispatcher = None
+        self.saving = None
+        self.dirty = False
+        self.firing = set()
+
+    async def start(self):
+        for alarm in await asyncio.to_thread(self._load):
+            self.alarms[alarm.id] = alarm
+            self.heap.append((alarm.due, alarm.id))
+        heapq.heapify(self.heap)
+        self.ids = itertools.count(max(self.alarms, default=0) + 1)
+        self.dispatcher = asyncio.create_task(self._dispatch())
+
+    async def close(self):
+        if self.dispatcher:
+            self.dispatcher.cancel()
+        if self.saving:
+            await self.saving
+        if self.dirty:
+            await asyncio.to_thread(self._save, self._snapshot())
+
+    def add(self, user_id, channel_id, name, hour, minute, tz, repeat=None) -> Alarm:
+        alarm = Alarm(next(self.ids), user_id, channel_id, name, hour, minute, tz, repeat)
+        alarm.due = next_occurrence(hour, minute, tz, repeat)
+        self.alarms[alarm.id] = alarm
+        self._push(alarm)
+        self._request_save()
+        return alarm
+
+    def cancel(self, alarm_id: int, user_id=None) -> bool:
+        alarm = self.alarms.get(alarm_id)
+        if alarm is None or (user_id is not None and alarm.user_id != user_id):
+            return False
+        del self.alarms[alarm_id]
+        if len(self.heap) > 2 * len(self.alarms) + 64:
+            # Mostly stale entries: rebuild instead of letting them pile up
+            self.heap = [(a.due, a.id) for a in self.alarms.values()]
+            heapq.heapify(self.heap)
+            self.wake.set()
+        self._request_save()
+        return True
+
+    def for_user(self, user_id: int) -> list:
+        return sorted((a for a in self.alarms.values() if a.user_id == user_id), key=lambda a: a.due)
+
+    def _push(self, alarm):
+        heapq.heappush(self.heap, (alarm.due, alarm.id))
+        if self.heap[0][1] == alarm.id:
+            self.wake.set()  # New earliest alarm: let the dispatcher shorten its sleep
+
+    async def _dispatch(self):
+        while True:
+            if not self.heap:
+                self.wake.clear()
+                await self.wake.wait()
+                continue
+
+            due, alarm_id = self.heap[0]
+            alarm = self.alarms.get(alarm_id)
+            if alarm is None or alarm.due != due:
+                heapq.heappop(self.heap)  # Cancelled or rescheduled
+                continue
+
+            delay = due - time.time()
+            if delay > 0:
+                self.wake.clear()
+                try:
+                    await asyncio.wait_for(self.wake.wait(), min(delay, MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self.heap)
+            if alarm.repeat:
+                alarm.reschedule()
+                heapq.heappush(self.heap, (alarm.due, alarm.id))
+            else:
+                del self.alarms[alarm_id]
+            self._request_save()
+            task = asyncio.create_task(self._fire(alarm))
+            self.firing.add(task)
+            task.add_done_callback(self.firing.discard)
+
+    async def _fire(self, alarm):
+        try:
+            await self.on_fire(alarm)
+        except Exception as e:
+            print(f'Alarm {alarm.id} failed to fire: {e}')
+
+    def _snapshot(self):
+        return [alarm.to_dict() for alarm in self.alarms.values()]
+
+    def _request_save(self):
+        # Coalesce bursts of changes into one background write
+        self.dirty = True
+        if self.saving is None:
+            self.saving = asyncio.create_task(self._save_loop())
+
+    async def _save_loop(self):
+        try:
+            while self.dirty:
+                self.dirty = False
+                try:
+                    await asyncio.to_thread(self._save, self._snapshot())
+                except OSError as e:
+                    print(f'Failed to save alarms: {e}')
+        finally:
+            self.saving = None
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return [Alarm.from_dict(data) for data in json.load(f)]
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            print(f'Could not load alarms from {self.path}: {e}')
+            return []
+
+    def _save(self, rows):
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(rows, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
@@ -0,0 +1,35 @@
+import discord
+from utils import metrics
+
+FFMPEG_SPAWN_SECONDS = metrics.histogram('ffmpeg_spawn_seconds', 'Time to probe and spawn an ffmpeg audio source.', labels=('path',))
+
+
+def is_opus(info: dict):
+    """True if the stream is already 48 kHz Opus, False if not, None if unknown."""
+    acodec = info.get('acodec')
+    if not acodec or acodec == 'none':
+        return None
+    return acodec == 'opus' and info.get('asr') in (None, 48000)
+
+
+async def make_source(info: dict, ffmpeg_opts: dict, mode: str = 'auto') -> discord.AudioSource:
+    """Build the playback source for a resolved track.
+
+    In 'auto' mode Opus streams (YouTube's WebM audio) are passed through to
+    Discord packet by packet with no decode or re-encode; anything else falls
+    back to PCM, which discord.py encodes in the player thread. Streams whose
+    codec the extractor did not report are probed with ffprobe first. 'pcm'
+    forces the old decode path.
+    """
+    url = info['url']
+    if mode != 'pcm':
+        opus = is_opus(info)
+        if opus is None:
+            with FFMPEG_SPAWN_SECONDS.time(path='probe'):
+                codec, _ = await discord.FFmpegOpusAudio.probe(url)
+            opus = codec == 'opus'
+        if opus:
+            with FFMPEG_SPAWN_SECONDS.time(path='passthrough'):
+                return discord.FFmpegOpusAudio(url, codec='copy', **ffmpeg_opts)
+    with FFMPEG_SPAWN_SECONDS.time(path='pcm'):
+        return discord.FFmpegPCMAudio(url, **ffmpeg_opts)
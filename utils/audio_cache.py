@@ -0,0 +1,115 @@
+import asyncio
+import os
+import re
+from collections import OrderedDict
+from utils.audio import is_opus
+
+
+def safe_name(track_id: str) -> str:
+    return re.sub(r'[^\w-]', '_', track_id)
+
+
+class AudioCache:
+    """On-disk Opus cache for frequently played tracks.
+
+    Once a track has been played `threshold` times it is downloaded in the
+    background (Opus streams are copied, anything else is transcoded) and
+    written atomically into `directory`. Files are evicted least recently
+    played first to stay under `max_bytes`.
+    """
+
+    def __init__(self, directory='audio_cache', max_bytes=2 * 1024 ** 3, threshold=3, max_downloads=1):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self.plays = OrderedDict()
+        self.files = OrderedDict()  # name -> size, least recently played first
+        self.size = 0
+        self.downloading = {}
+        self.semaphore = asyncio.Semaphore(max_downloads)
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.part'):
+                os.remove(entry.path)
+            elif entry.name.endswith('.opus'):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-len('.opus')], stat.st_size))
+        for _, name, size in sorted(found):
+            self.files[name] = size
+            self.size += size
+
+    def _file(self, name):
+        return os.path.join(self.directory, f'{name}.opus')
+
+    def path(self, track_id: str):
+        """Local file for a track, or None if it is not cached."""
+        name = safe_name(track_id)
+        if name not in self.files:
+            return None
+        path = self._file(name)
+        if not os.path.exists(path):
+            self.size -= self.files.pop(name)
+            return None
+        self.files.move_to_end(name)
+        os.utime(path)  # mtime doubles as the LRU order across restarts
+        return path
+
+    def record_play(self, track_id: str, info: dict = None):
+        """Count a play; starts a background download once the threshold is reached.
+
+        `info` is the resolved stream (url, acodec, asr) to download from.
+        """
+        count = self.plays.pop(track_id, 0) + 1
+        self.plays[track_id] = count
+        while len(self.plays) > 10000:
+            self.plays.popitem(last=False)
+        name = safe_name(track_id)
+        if (info is not None and count >= self.threshold and name not in self.files
+                and name not in self.downloading):
+            task = asyncio.create_task(self._download(name, info))
+            self.downloading[name] = task
+            task.add_done_callback(lambda t: self.downloading.pop(name, None))
+
+    async def _download(self, name, info):
+        codec = ['-c:a', 'copy'] if is_opus(info) else ['-c:a', 'libopus', '-b:a', '128k']
+        final = self._file(name)
+        part = final + '.part'
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                'ffmpeg', '-y', '-loglevel', 'error',
+                '-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+                '-i', info['url'], '-vn', *codec, '-f', 'opus', part,
+                stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE)
+            try:
+                _, stderr = await process.communicate()
+            except asyncio.CancelledError:
+                process.kill()
+                await process.wait()
+                if os.path.exists(part):
+                    os.remove(part)
+                raise
+        if process.returncode != 0:
+            print(f'Caching {name} failed: {stderr.decode(errors="replace").strip()}')
+            if os.path.exists(part):
+                os.remove(part)
+            return
+        os.replace(part, final)
+        size = os.path.getsize(final)
+        self.files[name] = size
+        self.size += size
+        self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and len(self.files) > 1:
+            name, size = self.files.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self._file(name))
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        for task in self.downloading.values():
+            task.cancel()
@@ -0,0 +1,100 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Case- and whitespace-insensitive form of a prompt used for cache keys."""
+    return ' '.join(prompt.split()).casefold()
+
+
+def make_key(prompt: str, model: str, temperature: float, system_prompt: str) -> str:
+    payload = json.dumps([normalize_prompt(prompt), model, temperature, system_prompt])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache for model responses with an optional SQLite tier.
+
+    The memory tier is bounded both by entry count and by total UTF-8 size of
+    the stored responses. When `path` is given, entries are also written to a
+    SQLite file so they survive restarts; disk access runs in a worker thread.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=4 * 1024 * 1024, ttl=3600.0, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, value, size)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        self.db_lock = threading.Lock()
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+            self.db.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time(),))
+            self.db.commit()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries), 'bytes': self.size}
+
+    async def get(self, key: str):
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._discard(key)
+        if self.db is not None:
+            row = await asyncio.to_thread(self._db_get, key, now)
+            if row is not None:
+                self._store(key, row[0], row[1])
+                self.hits += 1
+                return row[0]
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        self._store(key, value, expires_at)
+        if self.db is not None:
+            await asyncio.to_thread(self._db_put, key, value, expires_at)
+
+    def close(self):
+        if self.db is not None:
+            with self.db_lock:
+                self.db.close()
+            self.db = None
+
+    def _store(self, key, value, expires_at):
+        size = len(value.encode())
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        self.entries[key] = (expires_at, value, size)
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, (_, _, evicted) = self.entries.popitem(last=False)
+            self.size -= evicted
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def _db_get(self, key, now):
+        with self.db_lock:
+            return self.db.execute('SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?', (key, now)).fetchone()
+
+    def _db_put(self, key, value, expires_at):
+        with self.db_lock:
+            self.db.execute('INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)', (key, value, expires_at))
+            self.db.commit()
@@ -0,0 +1,54 @@
+from io import BytesIO
+
+
+def top_players(stats: dict, top_n: int = 15) -> list:
+    """`(name, games_played, times_disconnected)` for the top players, the rest summed as 'Others'."""
+    ranked = sorted(stats.values(), key=lambda entry: entry['games_played'], reverse=True)
+    rows = [(entry['name'], entry['games_played'], entry['times_disconnected']) for entry in ranked[:top_n]]
+    rest = ranked[top_n:]
+    if rest:
+        rows.append((f'Others ({len(rest)})',
+                     sum(entry['games_played'] for entry in rest),
+                     sum(entry['times_disconnected'] for entry in rest)))
+    return rows
+
+
+def render_stats_chart(rows: list) -> bytes:
+    """Render the games/disconnections bar chart to PNG bytes.
+
+    Runs in a worker process and only uses the object-oriented Figure API,
+    so no global pyplot state is involved. The plotting libraries are
+    imported here so only the worker process ever pays for them.
+    """
+    import pandas as pd
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    # Convert the rows to a DataFrame
+    data = pd.DataFrame(rows, columns=['Name', 'Games Played', 'Times Disconnected'])
+
+    # Setting up the plotting
+    with sns.axes_style("whitegrid"):
+        fig = Figure(figsize=(10, 5))
+        ax = fig.subplots()
+
+        # Create bars for "Games Played" and "Times Disconnected"
+        sns.barplot(x='Name', y='Games Played', data=data, color='deepskyblue', label='Games Played', ax=ax)
+        sns.barplot(x='Name', y='Times Disconnected', data=data, color='tomato', label='Times Disconnected', ax=ax)
+
+        # Adding labels
+        for bar in ax.containers:
+            ax.bar_label(bar, label_type='edge', fontsize=9, color='black', fontweight='bold')
+
+        # Adding final touches to the plot
+        ax.set_xlabel('Player Names')
+        ax.set_ylabel('Count')
+        ax.set_title('Games Played and Disconnections per Player in Russian Roulette')
+        ax.legend()
+        ax.tick_params(axis='x', labelrotation=45)
+        fig.tight_layout()
+
+        # Save plot to a bytes buffer
+        buffer = BytesIO()
+        fig.savefig(buffer, format='png')
+    return buffer.getvalue()
@@ -0,0 +1,94 @@
+import asyncio
+from collections import OrderedDict
+import discord
+from utils.admission import TokenBucket
+
+
+class EditScheduler:
+    """Coalesces message edits and paces them per channel.
+
+    Each message has at most one pending edit: scheduling another one merges
+    into it, so intermediate animation frames are dropped when the channel
+    is behind. Every channel is drained by its own worker that spends tokens
+    from a bucket of `rate` edits per `per` seconds, matching Discord's
+    per-channel edit limit.
+    """
+
+    def __init__(self, rate=5, per=5.0):
+        self.rate = rate
+        self.per = per
+        self.channels = {}  # channel_id -> OrderedDict of message_id -> [message, kwargs, futures]
+        self.buckets = {}
+        self.workers = {}
+
+    def schedule_edit(self, message, **kwargs) -> asyncio.Future:
+        """Edit `message` as soon as the channel allows, replacing any edit still pending.
+
+        The returned future resolves once this state, or a newer one, is shown.
+        """
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_error)
+        channel_id = message.channel.id
+        pending = self.channels.setdefault(channel_id, OrderedDict())
+        entry = pending.get(message.id)
+        if entry is None:
+            pending[message.id] = [message, kwargs, [future]]
+        else:
+            entry[1] = {**entry[1], **kwargs}
+            entry[2].append(future)
+        if channel_id not in self.workers:
+            self.workers[channel_id] = asyncio.create_task(self._drain(channel_id))
+        return future
+
+    async def _drain(self, channel_id):
+        bucket = self.buckets.get(channel_id)
+        if bucket is None:
+            bucket = self.buckets[channel_id] = TokenBucket(self.rate / self.per, self.rate)
+        pending = self.channels[channel_id]
+        try:
+            while pending:
+                wait = bucket.retry_after()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                bucket.take()
+                _, (message, kwargs, futures) = pending.popitem(last=False)
+                try:
+                    await message.edit(**kwargs)
+                except discord.HTTPException as e:
+                    if e.status == 429:
+                        bucket.block(getattr(e, 'retry_after', None) or self.per)
+                    _settle(futures, error=e)
+                except Exception as e:
+                    _settle(futures, error=e)
+                else:
+                    _settle(futures)
+        finally:
+            del self.workers[channel_id]
+            if not pending:
+                del self.channels[channel_id]
+                if bucket.is_full(bucket.updated):
+                    self.buckets.pop(channel_id, None)
+
+
+def _settle(futures, error=None):
+    for future in futures:
+        if future.done():
+            continue
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+
+
+def _consume_error(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f'Scheduled edit failed: {future.exception()}')
+
+
+# Shared scheduler used by the cogs
+scheduler = EditScheduler()
+
+
+def schedule_edit(message, **kwargs) -> asyncio.Future:
+    return scheduler.schedule_edit(message, **kwargs)
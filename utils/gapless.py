@@ -0,0 +1,203 @@
+import threading
+import time
+from array import array
+from collections import deque
+import discord
+
+FRAMES_PER_SECOND = 50  # discord.py reads one 20 ms frame at a time
+
+
+class PrebufferedSource(discord.AudioSource):
+    """Reads frames from another source ahead of time on a background thread.
+
+    Creating it starts ffmpeg and fills up to `max_frames` frames, so the
+    first read() after a track change returns immediately.
+    """
+
+    def __init__(self, source, max_frames=5 * FRAMES_PER_SECOND):
+        self.source = source
+        self.max_frames = max_frames
+        self.frames = deque()
+        self.finished = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._fill, daemon=True, name='prebuffer')
+        self.thread.start()
+
+    def _fill(self):
+        try:
+            while True:
+                with self.condition:
+                    while len(self.frames) >= self.max_frames and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        return
+                data = self.source.read()
+                if not data:
+                    return
+                with self.condition:
+                    self.frames.append(data)
+                    self.condition.notify_all()
+        except Exception as e:
+            # A corrupt stream must end the track, not leave read() waiting forever
+            print(f'Prebuffer stopped, the source failed: {e!r}')
+        finally:
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def buffered(self) -> int:
+        return len(self.frames)
+
+    def read(self) -> bytes:
+        with self.condition:
+            while not self.frames and not self.finished and not self.closed:
+                self.condition.wait()
+            if not self.frames:
+                return b''
+            data = self.frames.popleft()
+            self.condition.notify_all()
+            return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.source.cleanup()
+
+
+def mix(current: bytes, upcoming: bytes, weight: float) -> bytes:
+    """Blend two 16-bit PCM frames, `weight` being the share of `upcoming`."""
+    a = array('h', current)
+    b = array('h', upcoming)
+    if len(b) < len(a):
+        b.extend([0] * (len(a) - len(b)))
+    keep = 1.0 - weight
+    out = array('h', (max(-32768, min(32767, int(x * keep + y * weight))) for x, y in zip(a, b)))
+    return out.tobytes()
+
+
+class TrackChain(discord.AudioSource):
+    """Plays a track and hands over to a prepared next track without a gap.
+
+    While the current track is playing, `on_due()` is called (from the player
+    thread) once it is within `lead` seconds of its expected end; the owner
+    then prepares the next source and passes it to `set_next()`. When the
+    current track runs out the chain switches to the prepared one within the
+    same read() call, optionally crossfading the last `crossfade` seconds
+    (PCM only). `on_transition(tag, latency)` reports every switch, `latency`
+    being the seconds between the end of the previous audio and the first
+    frame of the new one.
+    """
+
+    def __init__(self, source, duration=None, tag=None, ended_at=None,
+                 on_due=None, on_transition=None, lead=5.0, crossfade=0.0):
+        self.current = source
+        self.duration = duration
+        self.tag = tag
+        self.ended_at = ended_at
+        self.on_due = on_due
+        self.on_transition = on_transition
+        self.lead = lead
+        self.crossfade = crossfade if not source.is_opus() else 0.0
+        self.opus = source.is_opus()
+        self.frames = 0
+        self.due_sent = False
+        self.next = None
+        self.faded = 0  # frames of the next track already mixed into a crossfade
+        self.skipping = False
+        self.lock = threading.Lock()
+
+    def is_opus(self) -> bool:
+        return self.opus
+
+    def _frames_left(self):
+        if not self.duration:
+            return None
+        return self.duration * FRAMES_PER_SECOND - self.frames
+
+    def set_next(self, source, duration=None, tag=None) -> bool:
+        """Queue the source to switch to; False if it cannot join this chain."""
+        if source.is_opus() != self.opus:
+            return False
+        with self.lock:
+            previous, self.next = self.next, (source, duration, tag)
+            self.faded = 0
+        if previous is not None:
+            previous[0].cleanup()
+        return True
+
+    def clear_next(self):
+        """Drop the prepared source and ask for a new one if it is due."""
+        with self.lock:
+            previous, self.next = self.next, None
+            self.faded = 0
+            self.due_sent = False
+        if previous is not None:
+            previous[0].cleanup()
+
+    def skip(self) -> bool:
+        """Switch to the prepared next track right away; False if none is ready."""
+        with self.lock:
+            if self.next is None:
+                return False
+            self.skipping = True
+            return True
+
+    def read(self) -> bytes:
+        if self.skipping:
+            self.skipping = False
+            return self._advance(time.perf_counter())
+        data = self.current.read()
+        if self.ended_at is not None and data:
+            self._report(self.tag, time.perf_counter() - self.ended_at)
+            self.ended_at = None
+        if not data:
+            return self._advance(time.perf_counter())
+
+        self.frames += 1
+        left = self._frames_left()
+        if left is not None and left <= self.lead * FRAMES_PER_SECOND and not self.due_sent:
+            self.due_sent = True
+            if self.on_due is not None:
+                self.on_due()
+        if self.crossfade and left is not None and left <= self.crossfade * FRAMES_PER_SECOND:
+            with self.lock:
+                upcoming = self.next
+            if upcoming is not None:
+                nxt = upcoming[0].read()
+                if nxt:
+                    self.faded += 1
+                    weight = 1.0 - max(left, 0) / (self.crossfade * FRAMES_PER_SECOND)
+                    data = mix(data, nxt, weight)
+        return data
+
+    def _advance(self, ended_at) -> bytes:
+        with self.lock:
+            upcoming, self.next = self.next, None
+            faded, self.faded = self.faded, 0
+        if upcoming is None:
+            return b''
+        self.current.cleanup()
+        self.current, self.duration, self.tag = upcoming
+        self.frames = faded
+        self.due_sent = False
+        data = self.current.read()
+        self._report(self.tag, time.perf_counter() - ended_at)
+        if data:
+            self.frames += 1
+        return data
+
+    def _report(self, tag, latency):
+        if self.on_transition is not None:
+            self.on_transition(tag, latency)
+
+    def cleanup(self):
+        self.current.cleanup()
+        with self.lock:
+            upcoming, self.next = self.next, None
+        if upcoming is not None:
+            upcoming[0].cleanup()
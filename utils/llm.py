@@ -0,0 +1,145 @@
+import asyncio
+from groq import AsyncGroq, RateLimitError
+from utils import metrics
+from utils.cache import make_key
+
+LLM_TOKENS = metrics.histogram('llm_tokens', 'Tokens used per completion.', labels=('kind',),
+                               buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192))
+
+
+def record_usage(usage) -> None:
+    if usage is not None:
+        LLM_TOKENS.observe(usage.prompt_tokens, kind='prompt')
+        LLM_TOKENS.observe(usage.completion_tokens, kind='completion')
+
+
+def retry_after(error, default=1.0) -> float:
+    """Seconds to back off after a 429, read from the response headers."""
+    try:
+        return float(error.response.headers.get('retry-after', default))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+
+class CompletionService:
+    """Async wrapper around the Groq chat API with a global concurrency cap."""
+
+    def __init__(self, api_key, model="llama3-8b-8192", system_prompt="Answer the prompt.",
+                 temperature=0.5, max_tokens=1024, max_concurrency=4, timeout=30.0, cache=None,
+                 on_rate_limit=None):
+        self.client = AsyncGroq(api_key=api_key)
+        self.model = model
+        self.system_prompt = system_prompt
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = {}
+        self.cache = cache
+        self.on_rate_limit = on_rate_limit
+
+    def build_messages(self, prompt: str) -> list:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+
+    def cache_key(self, prompt: str) -> str:
+        return make_key(prompt, self.model, self.temperature, self.system_prompt)
+
+    async def _request(self, prompt: str, stream: bool):
+        try:
+            return await self.client.chat.completions.create(
+                messages=self.build_messages(prompt),
+                model=self.model,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                top_p=1,
+                stop=None,
+                stream=stream,
+            )
+        except RateLimitError as e:
+            if self.on_rate_limit is not None:
+                self.on_rate_limit(retry_after(e))
+            raise
+
+    async def _create(self, prompt: str) -> str:
+        async with self.semaphore:
+            chat_completion = await self._request(prompt, stream=False)
+        record_usage(getattr(chat_completion, 'usage', None))
+        return chat_completion.choices[0].message.content
+
+    async def cached(self, prompt: str):
+        """The cached answer to `prompt`, or None. Never calls the model."""
+        if self.cache is None:
+            return None
+        return await self.cache.get(self.cache_key(prompt))
+
+    async def complete(self, prompt: str, key=None) -> str:
+        """Run one completion; raises asyncio.TimeoutError past the deadline.
+
+        Passing a `key` (e.g. the Discord message id) lets `cancel(key)` abort
+        the request while it is still waiting or running. The answer is stored
+        in the cache but not looked up there: check `cached` first.
+        """
+        task = asyncio.ensure_future(asyncio.wait_for(self._create(prompt), self.timeout))
+        if key is not None:
+            self.in_flight[key] = task
+        try:
+            response = await task
+        finally:
+            if key is not None and self.in_flight.get(key) is task:
+                del self.in_flight[key]
+        if self.cache is not None and response:
+            await self.cache.put(self.cache_key(prompt), response)
+        return response
+
+    async def stream(self, prompt: str, key=None):
+        """Yield the completion as text deltas while the model generates it.
+
+        The timeout applies to the whole stream; `cancel(key)` cancels the
+        task consuming the stream. Like `complete`, it only writes the cache.
+        """
+        parts = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        if key is not None:
+            self.in_flight[key] = asyncio.current_task()
+        try:
+            async with self.semaphore:
+                response = await asyncio.wait_for(self._request(prompt, stream=True), deadline - loop.time())
+                chunks = response.__aiter__()
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                        except StopAsyncIteration:
+                            break
+                        # Groq reports usage on the final chunk
+                        record_usage(getattr(getattr(chunk, 'x_groq', None), 'usage', None))
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+                            yield parts[-1]
+                finally:
+                    await response.close()
+        finally:
+            if key is not None and self.in_flight.get(key) is asyncio.current_task():
+                del self.in_flight[key]
+        if self.cache is not None and parts:
+            await self.cache.put(self.cache_key(prompt), ''.join(parts))
+
+    def cancel(self, key) -> bool:
+        """Cancel the in-flight request registered under `key`, if any."""
+        task = self.in_flight.pop(key, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def close(self) -> None:
+        for task in list(self.in_flight.values()):
+            task.cancel()
+        self.in_flight.clear()
+        if self.cache is not None:
+            self.cache.close()
+        await self.client.close()
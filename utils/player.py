@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import deque
+from enum import Enum
+from utils import metrics
+
+QUEUE_DEPTH = metrics.gauge('music_queue_depth', 'Songs waiting in each guild queue.', labels=('guild',))
+TRANSITION_SECONDS = metrics.histogram('music_transition_seconds', 'Gap between one song ending and the next starting.')
+
+
+class PlayerState(Enum):
+    IDLE = 'idle'
+    RESOLVING = 'resolving'
+    PLAYING = 'playing'
+    PAUSED = 'paused'
+
+
+class GuildPlayer:
+    """Queue and playback state for one guild."""
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.queue = deque()
+        self.state = PlayerState.IDLE
+        self.current = None
+        self.chain = None  # TrackChain feeding the voice client while playing
+        self.transitions = deque(maxlen=50)  # recent track change latencies in seconds
+        self.last_active = time.monotonic()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def set_state(self, state: PlayerState):
+        self.state = state
+        self.touch()
+
+    def record_transition(self, latency: float):
+        self.transitions.append(latency)
+        TRANSITION_SECONDS.observe(latency)
+
+    def enqueue(self, track: dict) -> int:
+        """Append a track and return its 1-based position."""
+        self.queue.append(track)
+        self.touch()
+        return len(self.queue)
+
+    def dequeue(self):
+        """Pop the next track into `current`, or None when the queue is empty."""
+        self.current = self.queue.popleft() if self.queue else None
+        self.touch()
+        return self.current
+
+    def remove(self, index: int) -> dict:
+        """Remove and return the track at a 0-based queue index."""
+        track = self.queue[index]
+        del self.queue[index]
+        self.touch()
+        return track
+
+    def clear(self):
+        self.queue.clear()
+        self.touch()
+
+    def upcoming(self, n: int) -> list:
+        return [self.queue[i] for i in range(min(n, len(self.queue)))]
+
+
+class PlayerManager:
+    """Creates GuildPlayers on demand and tears down the ones left idle.
+
+    A player is torn down once it has been idle with an empty queue for
+    `idle_timeout` seconds; `on_teardown(guild_id)` is awaited first so the
+    owner can disconnect from voice.
+    """
+
+    def __init__(self, idle_timeout=300.0, sweep_interval=60.0, on_teardown=None):
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.on_teardown = on_teardown
+        self.players = {}
+        self.reaper = None
+
+    def __len__(self):
+        return len(self.players)
+
+    def get(self, guild_id: int) -> GuildPlayer:
+        player = self.players.get(guild_id)
+        if player is None:
+            player = self.players[guild_id] = GuildPlayer(guild_id)
+        return player
+
+    def peek(self, guild_id: int):
+        """The guild's player if one exists, without creating it."""
+        return self.players.get(guild_id)
+
+    def start(self):
+        if self.reaper is None:
+            self.reaper = asyncio.create_task(self._reap_loop())
+            QUEUE_DEPTH.collect_from('music', lambda: {(guild_id,): len(player) for guild_id, player in self.players.items()})
+
+    def close(self):
+        if self.reaper is not None:
+            self.reaper.cancel()
+            self.reaper = None
+            QUEUE_DEPTH.collect_from('music', None)
+        self.players.clear()
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self.reap()
+
+    async def reap(self):
+        deadline = time.monotonic() - self.idle_timeout
+        idle = [guild_id for guild_id, player in self.players.items()
+                if player.state is PlayerState.IDLE and not player.queue and player.last_active < deadline]
+        for guild_id in idle:
+            if self.on_teardown is not None:
+                try:
+                    await self.on_teardown(guild_id)
+                except Exception as e:
+                    print(e)
+            player = self.players.get(guild_id)
+            # Someone may have started playing while we awaited the teardown hook
+            if player is not None and player.state is PlayerState.IDLE and not player.queue:
+                del self.players[guild_id]
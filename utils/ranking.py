@@ -0,0 +1,39 @@
+from bisect import bisect_left, insort
+
+
+class RankingIndex:
+    """Players of one guild kept sorted by games played (most first).
+
+    Keys are `(-games_played, user_id)` tuples in a sorted list: a rank lookup
+    is a binary search, and an update is a search plus one list shift.
+    """
+
+    def __init__(self, stats: dict = None):
+        self.games = {}
+        self.keys = []
+        for user_id, entry in (stats or {}).items():
+            self.games[int(user_id)] = entry['games_played']
+        self.keys = sorted((-games, user_id) for user_id, games in self.games.items())
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, user_id, games_played: int):
+        user_id = int(user_id)
+        old = self.games.get(user_id)
+        if old is not None:
+            index = bisect_left(self.keys, (-old, user_id))
+            del self.keys[index]
+        self.games[user_id] = games_played
+        insort(self.keys, (-games_played, user_id))
+
+    def rank(self, user_id):
+        """1-based rank (ties share the best rank), or None for unknown players."""
+        games = self.games.get(int(user_id))
+        if games is None:
+            return None
+        return bisect_left(self.keys, (-games,)) + 1
+
+    def page(self, offset: int, limit: int) -> list:
+        """`(rank, user_id)` pairs for one page of the leaderboard."""
+        return [(self.rank(user_id), user_id) for _, user_id in self.keys[offset:offset + limit]]
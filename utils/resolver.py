@@ -0,0 +1,114 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import yt_dlp
+from utils import metrics
+from utils.track_cache import TrackCache, video_id
+
+# Base yt-dlp options shared by every extraction; Opus audio is preferred so
+# playback can pass it through without re-encoding
+YDL_OPTS = {
+    'format': 'bestaudio[acodec=opus]/bestaudio/best',
+    'quiet': True,
+}
+
+EXTRACT_SECONDS = metrics.histogram('ytdlp_extract_seconds', 'Time spent in one yt-dlp extraction.', labels=('kind',))
+
+
+def extract(url: str, **opts) -> dict:
+    """Blocking yt-dlp extraction; only ever called from the resolver's pool."""
+    kind = 'flat' if opts.get('extract_flat') else 'full'
+    with EXTRACT_SECONDS.time(kind=kind), yt_dlp.YoutubeDL({**YDL_OPTS, **opts}) as ydl:
+        return ydl.extract_info(url, download=False)
+
+
+class TrackResolver:
+    """Runs yt-dlp extractions in a thread pool behind an async API.
+
+    Concurrent requests for the same thing share one extraction, and every
+    call gives up after `timeout` seconds (the extraction itself keeps running
+    for any other waiters). Single-video results go through a TrackCache, so
+    replaying a recent track skips extraction entirely.
+    """
+
+    def __init__(self, max_workers=4, timeout=20.0, cache=None):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='yt-dlp')
+        self.timeout = timeout
+        self.in_flight = {}
+        self.cache = cache if cache is not None else TrackCache()
+
+    async def _run(self, key, url, **opts):
+        future = self.in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, lambda: extract(url, **opts))
+            self.in_flight[key] = future
+
+            def forget(done):
+                if self.in_flight.get(key) is done:
+                    del self.in_flight[key]
+            future.add_done_callback(forget)
+        return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+
+    async def resolve(self, url: str) -> dict:
+        """Metadata plus a playable stream URL (`url`) for a single video."""
+        track_id = video_id(url)
+        if track_id is not None:
+            cached = self.cache.get(track_id)
+            if cached is not None:
+                return cached
+        info = await self._run(('resolve', url), url)
+        return self.cache.put(info)
+
+    async def resolve_many(self, urls, limit: int = 4) -> list:
+        """Resolve several URLs with at most `limit` extractions at once.
+
+        Results come back in input order; a URL that fails yields its
+        exception in place instead of aborting the rest of the batch.
+        """
+        semaphore = asyncio.Semaphore(limit)
+
+        async def resolve_one(url):
+            async with semaphore:
+                return await self.resolve(url)
+
+        return await asyncio.gather(*(resolve_one(url) for url in urls), return_exceptions=True)
+
+    async def stream(self, track: dict) -> dict:
+        """Like resolve(), but only re-extracts if the cached stream URL went stale."""
+        stream = self.cache.get_stream(track['id'])
+        if stream is not None:
+            return {**track, **stream}
+        info = await self._run(('resolve', track['webpage_url']), track['webpage_url'])
+        return self.cache.put(info)
+
+    async def search(self, query: str, n: int = 1) -> list:
+        """Top `n` YouTube results for a free-text query, as flat entries."""
+        info = await self._run(('search', query, n), f'ytsearch{n}:{query}', extract_flat=True)
+        return info.get('entries') or []
+
+    async def resolve_playlist(self, url: str, items: str = None) -> dict:
+        """Flat playlist info; `items` is a yt-dlp range such as '1-5'."""
+        opts = {'extract_flat': True}
+        if items:
+            opts['playlist_items'] = items
+        return await self._run(('playlist', url, items), url, **opts)
+
+    async def iter_playlist(self, url: str, page_size: int = 50):
+        """Yield a playlist lazily as flat info dicts of `page_size` entries each."""
+        start = 1
+        while True:
+            info = await self.resolve_playlist(url, items=f'{start}-{start + page_size - 1}')
+            page = info.get('entries') or []
+            # Unavailable videos come back as None: drop them, but page by the raw length
+            info['entries'] = [entry for entry in page if entry]
+            if info['entries']:
+                yield info
+            if len(page) < page_size:
+                return
+            start += page_size
+
+    def shutdown(self):
+        for future in self.in_flight.values():
+            future.cancel()
+        self.in_flight.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
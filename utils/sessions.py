@@ -0,0 +1,135 @@
+import asyncio
+import time
+from collections import OrderedDict
+from utils import metrics
+from utils.edits import schedule_edit
+
+LIVE_SESSIONS = metrics.gauge('game_sessions', 'Live interactive game views.', labels=('game',))
+
+
+class SessionLimitError(Exception):
+    """Raised when a user already has as many open games as they are allowed."""
+
+
+class Session:
+    __slots__ = ('message', 'view', 'guild_id', 'user_id', 'last_active')
+
+    def __init__(self, message, view, guild_id, user_id):
+        self.message = message
+        self.view = view
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.last_active = time.monotonic()
+
+
+class SessionRegistry:
+    """Live interactive sessions (game views) keyed by their message ID.
+
+    Sessions are kept in least-recently-used order. A user may start at most
+    `per_user` sessions; past `per_guild` sessions in a guild, or `max_sessions`
+    overall, the least recently used one is evicted. Sessions idle for
+    `idle_timeout` seconds are evicted by a periodic sweep. Eviction disables
+    the view's buttons and drops every reference to it. Views that stopped on
+    their own (finished games) are released without an edit. The live count
+    is exported as the `game_sessions` gauge under `name`.
+    """
+
+    def __init__(self, name, max_sessions=1000, per_guild=25, per_user=3, idle_timeout=600.0, sweep_interval=60.0):
+        self.max_sessions = max_sessions
+        self.per_guild = per_guild
+        self.per_user = per_user
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.name = name
+        self.sessions = OrderedDict()
+        self.by_guild = {}  # guild_id -> OrderedDict of message_id, in LRU order
+        self.by_user = {}   # user_id -> set of message_id
+        self.reaper = None
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, message_id):
+        return message_id in self.sessions
+
+    def start(self):
+        if self.reaper is None:
+            self.reaper = asyncio.create_task(self._reap_loop())
+            LIVE_SESSIONS.collect_from(self.name, lambda: {(self.name,): len(self)})
+
+    def close(self):
+        if self.reaper is not None:
+            self.reaper.cancel()
+            self.reaper = None
+            LIVE_SESSIONS.collect_from(self.name, None)
+        for message_id in list(self.sessions):
+            self.evict(message_id)
+
+    def check(self, guild_id, user_id):
+        """Raise SessionLimitError if `user_id` may not open another session."""
+        for message_id in list(self.by_user.get(user_id, ())):
+            if self.sessions[message_id].view.is_finished():
+                self._drop(message_id)
+        if len(self.by_user.get(user_id, ())) >= self.per_user:
+            raise SessionLimitError(f"You already have {self.per_user} games open. Finish one first!")
+
+    def add(self, message, view, guild_id, user_id) -> Session:
+        session = Session(message, view, guild_id, user_id)
+        self.sessions[message.id] = session
+        self.by_guild.setdefault(guild_id, OrderedDict())[message.id] = None
+        self.by_user.setdefault(user_id, set()).add(message.id)
+
+        guild_sessions = self.by_guild[guild_id]
+        while len(guild_sessions) > self.per_guild:
+            self.evict(next(iter(guild_sessions)))
+        while len(self.sessions) > self.max_sessions:
+            self.evict(next(iter(self.sessions)))
+        return session
+
+    def get(self, message_id):
+        return self.sessions.get(message_id)
+
+    def touch(self, message_id):
+        session = self.sessions.get(message_id)
+        if session is None:
+            return
+        session.last_active = time.monotonic()
+        self.sessions.move_to_end(message_id)
+        self.by_guild[session.guild_id].move_to_end(message_id)
+
+    def evict(self, message_id):
+        """Disable the session's buttons and forget it."""
+        session = self._drop(message_id)
+        if session is None or session.view.is_finished():
+            return
+        for child in session.view.children:
+            child.disabled = True
+        session.view.stop()
+        schedule_edit(session.message, view=session.view)
+
+    def _drop(self, message_id):
+        session = self.sessions.pop(message_id, None)
+        if session is None:
+            return None
+        guild_sessions = self.by_guild[session.guild_id]
+        del guild_sessions[message_id]
+        if not guild_sessions:
+            del self.by_guild[session.guild_id]
+        user_sessions = self.by_user[session.user_id]
+        user_sessions.discard(message_id)
+        if not user_sessions:
+            del self.by_user[session.user_id]
+        return session
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.reap()
+
+    def reap(self):
+        deadline = time.monotonic() - self.idle_timeout
+        for message_id, session in list(self.sessions.items()):
+            if session.view.is_finished():
+                self._drop(message_id)
+            elif session.last_active < deadline:
+                self.evict(message_id)
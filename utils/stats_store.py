@@ -0,0 +1,208 @@
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from utils.ranking import RankingIndex
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rr_stats (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    games_played INTEGER NOT NULL DEFAULT 0,
+    times_disconnected INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS rr_stats_rank ON rr_stats (guild_id, games_played DESC);
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+'''
+
+UPSERT = '''
+INSERT INTO rr_stats (guild_id, user_id, name, games_played, times_disconnected)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (guild_id, user_id) DO UPDATE SET
+    name = excluded.name,
+    games_played = games_played + excluded.games_played,
+    times_disconnected = times_disconnected + excluded.times_disconnected
+'''
+
+REPLACE = '''
+INSERT OR REPLACE INTO rr_stats (guild_id, user_id, name, games_played, times_disconnected)
+VALUES (?, ?, ?, ?, ?)
+'''
+
+
+class StatsStore:
+    """Russian Roulette statistics in SQLite (WAL mode), partitioned by guild.
+
+    All database work runs on one dedicated thread, so callers just await
+    the coroutine methods. An existing JSON stats file is imported once under
+    `legacy_guild_id`, together with a marker row in the same transaction, and
+    then renamed to `<file>.migrated`. Without a `legacy_guild_id` the import
+    is skipped, since the old file doesn't say which guild it belongs to.
+    """
+
+    def __init__(self, path='russian_roulette_stats.db', legacy_json=None, legacy_guild_id=None):
+        self.path = path
+        self.legacy_json = legacy_json
+        self.legacy_guild_id = legacy_guild_id
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stats-db')
+        self.db = None
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def open(self):
+        await self._run(self._open)
+
+    async def close(self):
+        await self._run(self._close)
+        self.executor.shutdown(wait=False)
+
+    async def guild_stats(self, guild_id: int) -> dict:
+        """`{user_id: {'games_played', 'times_disconnected', 'name'}}`, most games first."""
+        return await self._run(self._guild_stats, guild_id)
+
+    async def all_stats(self) -> dict:
+        """`{guild_id: {user_id: stats}}` for every guild."""
+        return await self._run(self._all_stats)
+
+    async def write(self, rows):
+        """Overwrite `(guild_id, user_id, name, games_played, times_disconnected)` rows in one transaction."""
+        await self._run(self._replace, rows)
+
+    def _open(self):
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        if self.legacy_json and os.path.exists(self.legacy_json):
+            self._migrate()
+
+    def _migrate(self):
+        marker = f'legacy_json:{os.path.basename(self.legacy_json)}'
+        if self.db.execute('SELECT 1 FROM migrations WHERE name = ?', (marker,)).fetchone():
+            # Imported before, but the rename didn't happen: finish it without importing again
+            os.replace(self.legacy_json, self.legacy_json + '.migrated')
+            return
+        if self.legacy_guild_id is None:
+            print(f'Not importing {self.legacy_json}: set rr_legacy_guild_id to the guild its stats belong to')
+            return
+
+        with open(self.legacy_json, 'r') as file:
+            stats = json.load(file)
+        rows = [(self.legacy_guild_id, int(user_id), entry.get('name', user_id),
+                 entry.get('games_played', 0), entry.get('times_disconnected', 0))
+                for user_id, entry in stats.items()]
+        with self.db:
+            self.db.executemany(UPSERT, rows)
+            self.db.execute('INSERT INTO migrations (name) VALUES (?)', (marker,))
+        os.replace(self.legacy_json, self.legacy_json + '.migrated')
+        print(f'Migrated {len(rows)} Russian Roulette players from {self.legacy_json} into guild {self.legacy_guild_id}')
+
+    def _replace(self, rows):
+        with self.db:
+            self.db.executemany(REPLACE, rows)
+
+    def _all_stats(self):
+        stats = {}
+        cursor = self.db.execute('SELECT guild_id, user_id, games_played, times_disconnected, name FROM rr_stats')
+        for guild_id, user_id, games, disconnected, name in cursor:
+            stats.setdefault(guild_id, {})[str(user_id)] = {
+                'games_played': games, 'times_disconnected': disconnected, 'name': name}
+        return stats
+
+    def _guild_stats(self, guild_id):
+        cursor = self.db.execute(
+            'SELECT user_id, games_played, times_disconnected, name FROM rr_stats '
+            'WHERE guild_id = ? ORDER BY games_played DESC', (guild_id,))
+        return {str(user_id): {'games_played': games, 'times_disconnected': disconnected, 'name': name}
+                for user_id, games, disconnected, name in cursor}
+
+    def _close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+class StatsCache:
+    """Resident copy of every guild's stats with write-behind to a StatsStore.
+
+    Reads are served from memory. `update_stats` marks the row dirty, and
+    dirty rows are written in a single transaction every `flush_interval`
+    seconds and on close, so disk writes per minute stay bounded no matter
+    how many games are played.
+    """
+
+    def __init__(self, store: StatsStore, flush_interval=30.0):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.stats = {}
+        self.versions = {}  # guild_id -> counter bumped on every change
+        self.rankings = {}  # guild_id -> RankingIndex
+        self.dirty = set()
+        self.flusher = None
+
+    async def load(self):
+        self.stats = await self.store.all_stats()
+        self.rankings = {guild_id: RankingIndex(stats) for guild_id, stats in self.stats.items()}
+        self.flusher = asyncio.create_task(self._flush_loop())
+
+    def guild_stats(self, guild_id: int) -> dict:
+        return self.stats.get(guild_id, {})
+
+    def ranking(self, guild_id: int) -> RankingIndex:
+        ranking = self.rankings.get(guild_id)
+        if ranking is None:
+            ranking = self.rankings[guild_id] = RankingIndex()
+        return ranking
+
+    def version(self, guild_id: int) -> int:
+        return self.versions.get(guild_id, 0)
+
+    def update_stats(self, guild_id: int, member, disconnected=False):
+        """Update statistics for a member."""
+        stats = self.stats.setdefault(guild_id, {})
+        user_id = str(member.id)
+        if user_id not in stats:
+            stats[user_id] = {'games_played': 0, 'times_disconnected': 0, 'name': member.display_name}
+        stats[user_id]['name'] = member.display_name
+        stats[user_id]['games_played'] += 1
+        if disconnected:
+            stats[user_id]['times_disconnected'] += 1
+        self.ranking(guild_id).update(user_id, stats[user_id]['games_played'])
+        self.dirty.add((guild_id, user_id))
+        self.versions[guild_id] = self.versions.get(guild_id, 0) + 1
+        return stats[user_id]
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        dirty, self.dirty = self.dirty, set()
+        rows = []
+        for guild_id, user_id in dirty:
+            entry = self.stats[guild_id][user_id]
+            rows.append((guild_id, int(user_id), entry['name'], entry['games_played'], entry['times_disconnected']))
+        try:
+            await self.store.write(rows)
+        except BaseException:
+            self.dirty |= dirty  # retry on the next flush
+            raise
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(e)
+
+    async def close(self):
+        if self.flusher is not None:
+            self.flusher.cancel()
+            self.flusher = None
+        await self.flush()
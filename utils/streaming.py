@@ -0,0 +1,93 @@
+import asyncio
+
+# Discord rejects messages longer than this
+MESSAGE_LIMIT = 2000
+
+
+def split_text(text: str, limit: int = MESSAGE_LIMIT) -> list:
+    """Split text into chunks under `limit`, preferring newline then space boundaries."""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit)
+        if cut <= 0:
+            cut = text.rfind(' ', 0, limit)
+        if cut <= 0:
+            chunks.append(text[:limit])
+            text = text[limit:]
+        else:
+            chunks.append(text[:cut])
+            text = text[cut + 1:]
+    chunks.append(text)
+    return chunks
+
+
+class StreamingReply:
+    """A reply that grows as text is fed to it.
+
+    A placeholder is posted on `start()`; fed text is flushed with at most one
+    edit per `interval` seconds, and rolls over into new messages at the
+    Discord length limit.
+    """
+
+    def __init__(self, channel, placeholder="✍️ ...", interval=1.0, limit=MESSAGE_LIMIT):
+        self.channel = channel
+        self.placeholder = placeholder
+        self.interval = interval
+        self.limit = limit
+        self.text = ''
+        self.offset = 0          # start of the current message inside self.text
+        self.shown = None        # content currently displayed in the current message
+        self.message = None
+        self.dirty = asyncio.Event()
+        self.done = False
+        self.flusher = None
+
+    async def start(self):
+        self.message = await self.channel.send(self.placeholder)
+        self.flusher = asyncio.create_task(self._flush_loop())
+
+    def feed(self, text: str):
+        self.text += text
+        self.dirty.set()
+
+    async def finish(self):
+        self.done = True
+        self.dirty.set()
+        if self.flusher is not None:
+            await self.flusher
+
+    async def _flush_loop(self):
+        while True:
+            await self.dirty.wait()
+            self.dirty.clear()
+            try:
+                await self._flush()
+            except Exception as e:
+                print(e)
+            if self.done:
+                return
+            await asyncio.sleep(self.interval)
+
+    async def _flush(self):
+        pending = self.text[self.offset:]
+        while len(pending) > self.limit:
+            head = split_text(pending, self.limit)[0]
+            await self._show(head)
+            self.offset += len(head)
+            # drop the separator we split on
+            if self.text[self.offset:self.offset + 1] in ('\n', ' '):
+                self.offset += 1
+            self.message = None
+            self.shown = None
+            pending = self.text[self.offset:]
+        if self.done and not self.text.strip():
+            pending = '(empty response)'
+        if pending.strip() and pending != self.shown:
+            await self._show(pending)
+
+    async def _show(self, content: str):
+        if self.message is None:
+            self.message = await self.channel.send(content)
+        else:
+            await self.message.edit(content=content)
+        self.shown = content
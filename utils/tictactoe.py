@@ -0,0 +1,123 @@
+WIN = 1000
+# Heuristic value of an open line by how many stones it already holds
+LINE_WEIGHTS = (0, 1, 8, 64, 512)
+
+
+def win_masks(size: int, k: int) -> list:
+    """Bit masks of every k-in-a-row line on a size x size board (cell = y * size + x)."""
+    masks = []
+    for y in range(size):
+        for x in range(size):
+            for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                end_x, end_y = x + dx * (k - 1), y + dy * (k - 1)
+                if 0 <= end_x < size and 0 <= end_y < size:
+                    masks.append(sum(1 << ((y + dy * i) * size + x + dx * i) for i in range(k)))
+    return masks
+
+
+class Engine:
+    """Tic-tac-toe on bitboards: each side is one int with a bit per cell.
+
+    Positions are always seen from the side to move as `(me, opp)`. Boards of
+    up to 9 cells are solved exactly by negamax; `precompute` fills the
+    transposition table for the whole game tree, so moves become dict
+    lookups. Larger boards use a depth-limited alpha-beta search with a
+    line-counting heuristic.
+    """
+
+    def __init__(self, size=3, k=None, depth=None):
+        self.size = size
+        self.k = k or size
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+        self.lines = win_masks(size, self.k)
+        self.cell_lines = [[m for m in self.lines if m >> cell & 1] for cell in range(self.cells)]
+        # Try cells on many lines (the centre) first: better alpha-beta cutoffs
+        self.order = sorted(range(self.cells), key=lambda cell: -len(self.cell_lines[cell]))
+        self.exact = self.cells <= 9
+        self.depth = depth or (4 if self.cells <= 16 else 3)
+        self.table = {}
+
+    def wins_with(self, bits: int, cell: int) -> bool:
+        """Whether `bits` completes a line through `cell` (the move just played)."""
+        return any(bits & m == m for m in self.cell_lines[cell])
+
+    def has_won(self, bits: int) -> bool:
+        return any(bits & m == m for m in self.lines)
+
+    def is_full(self, me: int, opp: int) -> bool:
+        return (me | opp) == self.full
+
+    def precompute(self):
+        if self.exact:
+            self.solve(0, 0)
+        return self
+
+    def best_move(self, me: int, opp: int) -> int:
+        if self.exact:
+            return self.solve(me, opp)[1]
+        return self.search(me, opp, self.depth, -WIN * 2, WIN * 2, {})[1]
+
+    def solve(self, me: int, opp: int):
+        """Exact negamax value and best cell; faster wins score higher."""
+        key = (me, opp)
+        hit = self.table.get(key)
+        if hit is not None:
+            return hit
+        empty = self.full & ~(me | opp)
+        best = (0, -1)
+        if empty:
+            best = (-WIN, -1)
+            remaining = bin(empty).count('1')
+            for cell in self.order:
+                bit = 1 << cell
+                if not empty & bit:
+                    continue
+                if self.wins_with(me | bit, cell):
+                    score = remaining
+                else:
+                    score = -self.solve(opp, me | bit)[0]
+                if score > best[0]:
+                    best = (score, cell)
+        self.table[key] = best
+        return best
+
+    def search(self, me: int, opp: int, depth: int, alpha: int, beta: int, seen: dict):
+        key = (me, opp)
+        hit = seen.get(key)
+        if hit is not None and hit[0] >= depth:
+            return hit[1]
+        empty = self.full & ~(me | opp)
+        if not empty:
+            return (0, -1)
+        if depth == 0:
+            return (self.evaluate(me, opp), -1)
+
+        best = (-WIN * 2, -1)
+        window_low = alpha
+        remaining = bin(empty).count('1')
+        for cell in self.order:
+            bit = 1 << cell
+            if not empty & bit:
+                continue
+            if self.wins_with(me | bit, cell):
+                score = WIN + remaining
+            else:
+                score = -self.search(opp, me | bit, depth - 1, -beta, -alpha, seen)[0]
+            if score > best[0]:
+                best = (score, cell)
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                return best  # Cut off: only a bound, don't cache it
+        if best[0] > window_low:
+            seen[key] = (depth, best)  # Exact value, not just an upper bound
+        return best
+
+    def evaluate(self, me: int, opp: int) -> int:
+        score = 0
+        for m in self.lines:
+            if not m & opp:
+                score += LINE_WEIGHTS[min(bin(m & me).count('1'), 4)]
+            elif not m & me:
+                score -= LINE_WEIGHTS[min(bin(m & opp).count('1'), 4)]
+        return score
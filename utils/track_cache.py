@@ -0,0 +1,86 @@
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d+)')
+
+# Keys kept from a yt-dlp info dict as long-lived metadata
+METADATA_KEYS = ('id', 'title', 'duration', 'thumbnail', 'webpage_url')
+
+
+def video_id(url: str):
+    """YouTube video id of a watch / youtu.be / shorts URL, or None."""
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if host.endswith('youtu.be'):
+        return parsed.path.strip('/') or None
+    if host.endswith('youtube.com'):
+        if parsed.path == '/watch':
+            return parse_qs(parsed.query).get('v', [None])[0]
+        if parsed.path.startswith(('/shorts/', '/live/')):
+            return parsed.path.split('/')[2] or None
+    return None
+
+
+def stream_expiry(stream_url: str, default_ttl=3600.0) -> float:
+    """Unix time a googlevideo stream URL stops working, from its `expire` parameter."""
+    match = EXPIRE_RE.search(stream_url)
+    if match:
+        return float(match.group(1))
+    return time.time() + default_ttl
+
+
+class TrackCache:
+    """Extracted track info split by lifetime.
+
+    Metadata (title, duration, thumbnail) is kept LRU-bounded for as long as
+    it fits; stream URLs are only handed out while they are at least `margin`
+    seconds away from their expiry.
+    """
+
+    def __init__(self, max_entries=2048, margin=120.0):
+        self.max_entries = max_entries
+        self.margin = margin
+        self.metadata = OrderedDict()  # id -> metadata dict
+        self.streams = {}              # id -> (stream info dict, expires_at)
+
+    def get_metadata(self, track_id):
+        meta = self.metadata.get(track_id)
+        if meta is not None:
+            self.metadata.move_to_end(track_id)
+        return meta
+
+    def get_stream(self, track_id):
+        entry = self.streams.get(track_id)
+        if entry is None:
+            return None
+        stream, expires_at = entry
+        if expires_at - self.margin <= time.time():
+            del self.streams[track_id]
+            return None
+        return stream
+
+    def get(self, track_id):
+        """Metadata merged with a fresh stream URL, or None if either is missing."""
+        meta = self.get_metadata(track_id)
+        stream = self.get_stream(track_id)
+        if meta is None or stream is None:
+            return None
+        return {**meta, **stream}
+
+    def put(self, info: dict) -> dict:
+        """Store a full yt-dlp info dict and return the trimmed cached form."""
+        track_id = info['id']
+        meta = {key: info.get(key) for key in METADATA_KEYS}
+        stream = {'url': info['url'], 'acodec': info.get('acodec'), 'asr': info.get('asr'), 'ext': info.get('ext')}
+        self.metadata[track_id] = meta
+        self.metadata.move_to_end(track_id)
+        self.streams[track_id] = (stream, stream_expiry(info['url']))
+        while len(self.metadata) > self.max_entries:
+            evicted, _ = self.metadata.popitem(last=False)
+            self.streams.pop(evicted, None)
+        return {**meta, **stream}
+
+    def invalidate_stream(self, track_id):
+        self.streams.pop(track_id, None)
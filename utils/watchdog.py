@@ -0,0 +1,131 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+
+# Frames under this directory are "ours"; the first one above the blocking call names the culprit
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Blocker:
+    __slots__ = ('where', 'call', 'command', 'count', 'total', 'worst')
+
+    def __init__(self, where, call, command):
+        self.where = where
+        self.call = call
+        self.command = command
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+
+
+class LoopWatchdog:
+    """Thread that notices when the event loop stops running and names the cause.
+
+    A heartbeat task on the loop stamps the time every `interval` seconds; the
+    watchdog thread checks the stamp. Once the loop is `threshold` seconds late
+    it grabs the loop thread's stack from `sys._current_frames()`, together
+    with the running task and the command that task is serving, and logs it.
+    When the loop recovers, the stall is added to per-call totals that
+    `top_blockers` reports.
+    """
+
+    def __init__(self, threshold=0.25, interval=0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.loop = None
+        self.loop_thread = None
+        self.beat = time.monotonic()
+        self.heartbeat = None
+        self.thread = None
+        self.stopped = threading.Event()
+        self.commands = weakref.WeakKeyDictionary()  # task -> command name, kept by track_command
+        self.blockers = {}
+        self.stall = None  # (blocker, worst lag so far) while the loop is stuck
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start watching the running loop; call from a coroutine on that loop."""
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.beat = time.monotonic()
+        self.heartbeat = asyncio.create_task(self._heartbeat())
+        self.thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.heartbeat is not None:
+            self.heartbeat.cancel()
+
+    def track_command(self, ctx):
+        """Remember which command the current task is running (from a before_invoke hook)."""
+        task = asyncio.current_task()
+        if task is not None:
+            self.commands[task] = ctx.command.qualified_name
+
+    def untrack_command(self):
+        task = asyncio.current_task()
+        if task is not None:
+            self.commands.pop(task, None)
+
+    async def _heartbeat(self):
+        while True:
+            self.beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        while not self.stopped.wait(self.interval):
+            lag = time.monotonic() - self.beat - self.interval
+            if lag >= self.threshold:
+                if self.stall is None:
+                    self.stall = (self._capture(lag), lag)
+                else:
+                    self.stall = (self.stall[0], lag)
+            elif self.stall is not None:
+                blocker, worst = self.stall
+                self.stall = None
+                with self.lock:
+                    blocker.count += 1
+                    blocker.total += worst
+                    blocker.worst = max(blocker.worst, worst)
+                print(f'Event loop was blocked for {worst * 1000:.0f} ms by {blocker.call} at {blocker.where}'
+                      f' (command: {blocker.command or "none"})')
+
+    def _capture(self, lag):
+        frame = sys._current_frames().get(self.loop_thread)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        # Drop the event loop's own frames above the callback that is running
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i].filename.endswith(os.path.join('asyncio', 'events.py')):
+                stack = stack[i + 1:]
+                break
+        task = asyncio.current_task(self.loop)
+        command = self.commands.get(task) if task is not None else None
+        task_name = task.get_name() if task is not None else 'callback'
+        coro = getattr(task.get_coro(), '__qualname__', '?') if task is not None else '?'
+
+        call = f'{stack[-1].name} ({os.path.basename(stack[-1].filename)}:{stack[-1].lineno})' if stack else '?'
+        where = '?'
+        for entry in reversed(stack):
+            if entry.filename.startswith(PROJECT_ROOT) and not entry.filename.endswith('watchdog.py'):
+                where = f'{os.path.relpath(entry.filename, PROJECT_ROOT)}:{entry.lineno} in {entry.name}'
+                break
+
+        print(f'Event loop stalled for {lag * 1000:.0f} ms+ in task {task_name} ({coro}), command: {command or "none"}\n'
+              + ''.join(traceback.format_list(stack[-10:])).rstrip())
+
+        key = (where, call, command)
+        with self.lock:
+            blocker = self.blockers.get(key)
+            if blocker is None:
+                blocker = self.blockers[key] = Blocker(where, call, command)
+        return blocker
+
+    def top_blockers(self, n=10) -> list:
+        """The `n` call sites that blocked the loop for the longest in total."""
+        with self.lock:
+            return sorted(self.blockers.values(), key=lambda b: -b.total)[:n]